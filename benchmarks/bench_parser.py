@@ -0,0 +1,66 @@
+"""Regression check and throughput benchmark for parse_single_tag
+
+Every case in parse_single_tag_corpus.jsonl holds OCR text and the tag the
+parser must produce for it. The corpus is checked first, then the cases are
+parsed in a loop to measure throughput.
+
+    python benchmarks/bench_parser.py [--tags 100000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricetags.parsing import parse_single_tag
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parse_single_tag_corpus.jsonl')
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def check_corpus(cases):
+    """Return the names of the cases whose parsed tag differs from the recorded one"""
+    return [case['name'] for case in cases if parse_single_tag(case['text']) != case['expected']]
+
+def time_parser(cases, tag_count):
+    """Parse tag_count texts, cycling through the corpus, and return elapsed seconds"""
+    texts = [case['text'] for case in cases]
+    batch = (texts * (tag_count // len(texts) + 1))[:tag_count]
+    start = time.perf_counter()
+    for text in batch:
+        parse_single_tag(text)
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tags', type=int, default=100000, help="Number of texts to parse for timing")
+    parser.add_argument('--json', action='store_true', help="Print a machine-readable result")
+    args = parser.parse_args(argv)
+    
+    cases = load_corpus()
+    failures = check_corpus(cases)
+    elapsed = time_parser(cases, args.tags)
+    result = {
+        'benchmark': 'parse_single_tag',
+        'corpus_cases': len(cases),
+        'corpus_failures': failures,
+        'tags': args.tags,
+        'seconds': round(elapsed, 4),
+        'tags_per_sec': round(args.tags / elapsed) if elapsed else None,
+    }
+    
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"Corpus: {len(cases) - len(failures)}/{len(cases)} cases match")
+        for name in failures:
+            print(f"  MISMATCH: {name}")
+        print(f"Parsed {args.tags} tags in {elapsed:.3f}s ({result['tags_per_sec']} tags/sec)")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
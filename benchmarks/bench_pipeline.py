@@ -0,0 +1,159 @@
+"""Throughput and peak memory of each stage of the tag pipeline
+
+Synthetic source sheets are generated with tag_sheets.py, then every stage
+runs in a fresh process, so the peak RSS it reports belongs to that stage:
+
+    extract          extract_text_from_pdf over the sheets (text layer, or OCR with --ocr)
+    parse            parse_single_tag over the printed tag texts
+    auto_split_text  fitting every product name, starting from empty layout caches
+    generate_pdf     rendering the expected tags into one PDF
+
+The result is one JSON object on stdout, also appended as a line to
+--output when given, so runs can be compared across releases.
+
+    python benchmarks/bench_pipeline.py [--pages 50] [--noise 0.2] [--seed 1] [--ocr] [--workers 4]
+                                        [--repeat 20] [--stages parse,generate_pdf] [--output bench.jsonl]
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import reportlab
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from pricetags.extraction import extract_text_from_pdf
+from pricetags.layout import fit_text, text_width
+from pricetags.parsing import make_barcode, parse_single_tag
+from pricetags.rendering import auto_split_text, generate_pdf
+from tag_sheets import make_tag_sheets
+
+STAGES = ('extract', 'parse', 'auto_split_text', 'generate_pdf')
+NAME_MAX_WIDTH = 3.6 * inch  # Same width the tag renderer fits names into
+COMPARED_FIELDS = ('description', 'sku', 'productName', 'price')
+
+def peak_rss_mb(who=None):
+    """Peak resident set size of this process (or of its largest child) in MB, None where unsupported"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def bench_extract(sheet_path, records, options):
+    tags = extract_text_from_pdf(sheet_path, workers=options['workers'], use_text_layer=not options['ocr'])
+    expected = {record['expected']['sku']: record['expected'] for record in records}
+    matched = sum(1 for tag in tags if expected.get(tag.get('sku')) == {field: tag.get(field) for field in COMPARED_FIELDS})
+    return len(tags), {'expected_tags': len(records), 'matched_tags': matched}
+
+def bench_parse(sheet_path, records, options):
+    texts = [record['text'] for record in records]
+    for _ in range(options['repeat']):
+        for text in texts:
+            parse_single_tag(text)
+    return len(texts) * options['repeat'], {}
+
+def bench_auto_split_text(sheet_path, records, options):
+    c = canvas.Canvas(io.BytesIO())
+    names = [record['expected']['productName'] for record in records]
+    for _ in range(options['repeat']):
+        fit_text.cache_clear()
+        text_width.cache_clear()
+        for name in names:
+            auto_split_text(name, NAME_MAX_WIDTH, c)
+    return len(names) * options['repeat'], {}
+
+def bench_generate_pdf(sheet_path, records, options):
+    tags = []
+    for record in records:
+        tag = dict(record['expected'], barcode=make_barcode(record['expected']['sku']), _missing_fields=[])
+        tags.append(tag)
+    pdf = generate_pdf(tags)
+    return len(tags), {'pdf_bytes': len(pdf.getvalue())}
+
+def run_stage(name, sheet_path, records, options):
+    """Run one stage in this (fresh) process and measure it"""
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    tags, extra = globals()[f"bench_{name}"](sheet_path, records, options)
+    seconds = time.perf_counter() - start
+    return dict(
+        extra,
+        seconds=round(seconds, 4),
+        tags=tags,
+        tags_per_sec=round(tags / seconds, 1) if seconds else None,
+        start_rss_mb=start_rss,
+        peak_rss_mb=peak_rss_mb(),
+        children_peak_rss_mb=peak_rss_mb(resource.RUSAGE_CHILDREN) if resource is not None else None,
+    )
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=50, help="Source sheets to generate (4 tags each)")
+    parser.add_argument('--noise', type=float, default=0.0, help="Sheet noise from 0 (clean) to 1")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--ocr', action='store_true', help="Extract with OCR instead of the text layer")
+    parser.add_argument('--workers', type=int, default=1, help="OCR workers for the extract stage")
+    parser.add_argument('--repeat', type=int, default=20, help="Passes over the tags for parse and auto_split_text")
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument('--output', help="Append the result as a JSON line to this file")
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    options = {'ocr': args.ocr, 'workers': args.workers, 'repeat': args.repeat}
+
+    result = {
+        'benchmark': 'pipeline',
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'reportlab': reportlab.Version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {'pages': args.pages, 'noise': args.noise, 'seed': args.seed, **options},
+        'stages': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='tagger_bench_') as tmp_dir:
+        sheet_path = os.path.join(tmp_dir, 'sheets.pdf')
+        records = make_tag_sheets(sheet_path, args.pages, args.noise, args.seed)
+        for stage in stages:
+            # A fresh process per stage keeps each peak RSS (and the layout caches) to itself
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                result['stages'][stage] = pool.submit(run_stage, stage, sheet_path, records, options).result()
+
+    line = json.dumps(result)
+    print(line)
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Check that sharded rendering works when __main__ is a script that must not run in the workers
+
+Under Streamlit the app script is __main__, and spawned render workers used to
+re-import it and die. This installs a __main__ script that fails on import,
+renders one PDF large enough to be split into shards over several worker
+processes, and checks the merged page count and that the workers did not
+have to fall back to an in-process render.
+
+    python benchmarks/check_render_workers.py [--workers 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader
+
+from pricetags import reporting
+from pricetags.rendering import DEFAULT_TAG_SETTINGS, MIN_SHARD_PAGES, imposition_for, write_tag_pdfs
+
+SCRIPT_MAIN = "raise SystemExit('the __main__ script was imported by a render worker')\n"
+
+def make_tags(count):
+    return [{'productName': f"WIDGET MODEL {n} DELUXE", 'sku': f"SK-{n:06d}", 'price': f"{n % 500}.99",
+             'barcode': f"SK{n:06d}", 'description': ''} for n in range(count)]
+
+def run_check(workers):
+    """Render with a script-style __main__; return the problems found"""
+    pages = 2 * MIN_SHARD_PAGES
+    tags = make_tags(pages * imposition_for(DEFAULT_TAG_SETTINGS).per_page)
+    events = []
+    reporting.set_handlers(log=events.append)
+    main = sys.modules['__main__']
+    with tempfile.TemporaryDirectory(prefix='tagger_render_check_') as tmp_dir:
+        script_path = os.path.join(tmp_dir, 'app_script.py')
+        with open(script_path, 'w') as f:
+            f.write(SCRIPT_MAIN)
+        script_main = types.ModuleType('__main__')
+        script_main.__file__ = script_path
+        sys.modules['__main__'] = script_main
+        try:
+            paths = write_tag_pdfs(tags, tmp_dir, workers=workers)
+        finally:
+            sys.modules['__main__'] = main
+        page_count = len(PdfReader(paths[0]).pages)
+    problems = []
+    if page_count != pages:
+        problems.append(f"merged PDF has {page_count} pages, expected {pages}")
+    problems.extend(event['message'] for event in events if 'Render workers failed' in event.get('message', ''))
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2, help="Render worker processes")
+    args = parser.parse_args(argv)
+
+    problems = run_check(args.workers)
+    for problem in problems:
+        print(f"  FAILED: {problem}")
+    if not problems:
+        print(f"Rendered {2 * MIN_SHARD_PAGES} pages in shards over {args.workers} workers with a script __main__")
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Randomized regression check of TagStore against the list of tag dicts it replaced
+
+The same synthetic tags are loaded into a TagStore and into a plain list of
+dicts, and both go through the same random edits: selection changes, cleared
+or emptied fields, deletions, appends of dicts and of records from another
+store, and select all / none. After every edit the SKU lookups must agree,
+and every few edits the full contents and the print counts must too.
+
+    python benchmarks/check_tag_store.py [--steps 300] [--tags 5000] [--seed 1]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricetags.store import TagStore
+from pricetags.validation import refresh_missing_fields
+
+FULL_CHECK_EVERY = 50  # Steps between comparisons of the whole store
+
+def make_tag(rng, number):
+    """A validated tag dict; some have no price, some carry a key the store does not know"""
+    tag = {
+        'productName': f"WIDGET MODEL {number % 900} DELUXE STAINLESS {number % 37}",
+        'sku': f"SKU-{number:06d}",
+        'price': '' if rng.random() < 0.1 else f"{rng.randint(1, 999)}.99",
+        'barcode': '',
+        'description': '',
+        'selected_for_print': rng.random() < 0.5,
+    }
+    if rng.random() < 0.05:
+        tag['note'] = f"note {number}"
+    refresh_missing_fields(tag)
+    return tag
+
+def compare(store, tags):
+    """Descriptions of the ways store differs from the list of dicts tags"""
+    problems = []
+    if store.to_dicts() != tags:
+        first = next((idx for idx, tag in enumerate(tags) if idx >= len(store) or store.to_dict(idx) != tag), len(tags))
+        problems.append(f"contents differ ({len(store)} vs {len(tags)} tags, first at {first})")
+    selected = [tag for tag in tags if tag['selected_for_print']]
+    if store.selected_count() != len(selected):
+        problems.append(f"selected_count {store.selected_count()} != {len(selected)}")
+    if store.problematic_count() != sum(1 for tag in selected if tag['_missing_fields']):
+        problems.append("problematic_count differs")
+    if store.to_dicts(store.selected_indices(True)) != [tag for tag in selected if not tag['_missing_fields']]:
+        problems.append("selected complete tags differ")
+    return problems
+
+def random_edit(rng, store, tags, other):
+    """Apply one random edit to both store and tags"""
+    op = rng.random()
+    if op < 0.3:
+        idx = rng.randrange(len(tags))
+        selected = rng.random() < 0.5
+        tags[idx]['selected_for_print'] = selected
+        store[idx]['selected_for_print'] = selected
+    elif op < 0.45:
+        idx = rng.randrange(len(tags))
+        tags[idx]['sku'] = tags[idx]['barcode'] = ''
+        store[idx]['sku'] = ''
+        store[idx]['barcode'] = ''
+        refresh_missing_fields(tags[idx])
+        refresh_missing_fields(store[idx])
+    elif op < 0.5:
+        # The store keeps '' for a field set to None, as append() does
+        idx = rng.randrange(len(tags))
+        field = rng.choice(('price', 'sku', 'description'))
+        tags[idx][field] = ''
+        store[idx][field] = None
+    elif op < 0.65:
+        removed = rng.sample(range(len(tags)), min(3, len(tags) - 1))
+        for idx in sorted(removed, reverse=True):
+            tags.pop(idx)
+        store.delete(removed)
+    elif op < 0.75:
+        selected = rng.random() < 0.5
+        store.set_all_selected(selected)
+        for tag in tags:
+            tag['selected_for_print'] = selected
+    elif op < 0.85:
+        idx = rng.randrange(len(other))
+        tags.append(other.to_dict(idx))
+        store.append(other[idx])
+    else:
+        tag = make_tag(rng, rng.randrange(10 ** 6))
+        tags.append(copy.deepcopy(tag))
+        store.append(tag)
+
+def run_check(steps, tag_count, seed):
+    """Run the random edits and return the problems found, each prefixed with its step"""
+    rng = random.Random(seed)
+    tags = [make_tag(rng, number) for number in range(tag_count)]
+    store = TagStore(tags)
+    tags = copy.deepcopy(tags)
+    other = TagStore(make_tag(rng, number) for number in range(tag_count, tag_count + 100))
+    problems = [f"initial: {problem}" for problem in compare(store, tags)]
+    for step in range(steps):
+        random_edit(rng, store, tags, other)
+        sku = rng.choice(tags)['sku']
+        if store.lookup('sku', sku) != [idx for idx, tag in enumerate(tags) if tag['sku'] == sku]:
+            problems.append(f"step {step}: lookup('sku', {sku!r}) differs")
+        if step % FULL_CHECK_EVERY == 0 or step == steps - 1:
+            problems.extend(f"step {step}: {problem}" for problem in compare(store, tags))
+        if problems:
+            break
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--steps', type=int, default=300, help="Number of random edits")
+    parser.add_argument('--tags', type=int, default=5000, help="Number of tags to start from")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    problems = run_check(args.steps, args.tags, args.seed)
+    for problem in problems:
+        print(f"  MISMATCH: {problem}")
+    if not problems:
+        print(f"TagStore matched the list of dicts over {args.steps} random edits")
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
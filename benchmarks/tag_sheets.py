@@ -0,0 +1,121 @@
+"""Synthetic 4-up source sheets for benchmarking extraction
+
+Each letter page holds four tags, one per quarter, in the layout the parser
+expects: a 'Hearth > <category>' line, 'Model #: <sku>', a product name over
+one or two lines, an optional 'Regular Price: $x' line, the sale price and
+a trailer line. The text is real PDF text, so both the text layer and OCR
+paths can read it.
+
+noise (0 to 1) makes the sheets look more like scans: characters are swapped
+for common OCR confusions, spacing is doubled, blocks are shifted off their
+usual position and the page is sprinkled with specks. 0 gives clean sheets.
+
+    python benchmarks/tag_sheets.py sheets.pdf [--pages 50] [--noise 0.2] [--seed 1] [--expected sheets.json]
+"""
+import argparse
+import json
+import random
+import sys
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+CATEGORIES = ('Gas Logs', 'Gas Logs & Accessories', 'Fireplace Tools', 'Grates', 'Screens & Doors', 'Wood Stoves',
+              'Chimney Care', 'Venting', 'Mantels')
+NAME_WORDS = ('BLUE', 'FLAME', 'UNIVERSAL', 'GAS', 'VALVE', 'KEY', 'OAK', 'LOG', 'SET', 'VENT', 'FREE', 'BURNER',
+              'STEEL', 'GRATE', 'BLACK', 'BRASS', 'SCREEN', 'TOOL', 'KIT', 'DELUXE', 'CERAMIC', 'FIBER', 'EMBER',
+              'REMOTE', 'CONTROL', 'IGNITION', 'PILOT', 'ASSEMBLY', '24"', '30"', '36"', 'DUAL', 'FUEL')
+TRAILERS = ('Contracts Available', 'In Stock', 'Special Order', '')
+OCR_CONFUSIONS = {'O': '0', '0': 'O', 'l': '1', '1': 'l', 'I': 'l', 'S': '5', '5': 'S', 'B': '8', '8': 'B', ',': '.'}
+QUARTER_ORIGINS = ((0.4, 10.3), (4.65, 10.3), (0.4, 4.8), (4.65, 4.8))  # Top-left of each tag block, inches
+LINE_HEIGHT = 16
+FONT_NAME = 'Helvetica'
+FONT_SIZE = 11
+
+def random_tag(rng, number):
+    """Clean field values for one synthetic tag"""
+    name = ' '.join(rng.choice(NAME_WORDS) for _ in range(rng.randint(2, 9)))
+    price = f"{rng.randint(5, 2500)}.{rng.choice(('99', '49', '00', '50'))}"
+    return {
+        'description': f"Hearth > {rng.choice(CATEGORIES)}",
+        'sku': f"{rng.choice(('MX', 'SVK', 'GL', 'HT'))}-{number:05d}",
+        'productName': name,
+        'price': price,
+        'regularPrice': f"{float(price) * 1.2:.2f}" if rng.random() < 0.5 else '',
+        'trailer': rng.choice(TRAILERS),
+    }
+
+def tag_lines(tag):
+    """The printed lines of a tag, splitting long names over two lines like the source sheets do"""
+    words = tag['productName'].split()
+    name_lines = [' '.join(words)] if len(words) <= 5 else [' '.join(words[:len(words) // 2]), ' '.join(words[len(words) // 2:])]
+    lines = [tag['description'], f"Model #: {tag['sku']}"] + name_lines
+    if tag['regularPrice']:
+        lines.append(f"Regular Price: ${tag['regularPrice']}")
+    lines.append(f"${tag['price']}")
+    if tag['trailer']:
+        lines.append(tag['trailer'])
+    return lines
+
+def add_text_noise(line, noise, rng):
+    """Swap characters for OCR confusions and double spaces with a probability scaled by noise"""
+    if not noise:
+        return line
+    chars = []
+    for char in line:
+        if char in OCR_CONFUSIONS and rng.random() < noise * 0.05:
+            char = OCR_CONFUSIONS[char]
+        elif char == ' ' and rng.random() < noise * 0.1:
+            char = '  '
+        chars.append(char)
+    return ''.join(chars)
+
+def make_tag_sheets(path, pages, noise=0.0, seed=0):
+    """Write a PDF of `pages` 4-up sheets and return one record per tag
+
+    Each record holds the clean 'expected' fields and the 'text' as printed
+    (noise included), in page and quarter order.
+    """
+    rng = random.Random(seed)
+    c = canvas.Canvas(path, pagesize=letter)
+    records = []
+    for page in range(pages):
+        for x, y in QUARTER_ORIGINS:
+            tag = random_tag(rng, len(records))
+            lines = [add_text_noise(line, noise, rng) for line in tag_lines(tag)]
+            shift = noise * 0.25 * inch
+            text = c.beginText(x * inch + rng.uniform(-shift, shift), y * inch + rng.uniform(-shift, shift))
+            text.setFont(FONT_NAME, FONT_SIZE)
+            text.setLeading(LINE_HEIGHT)
+            for line in lines:
+                text.textLine(line)
+            c.drawText(text)
+            records.append({
+                'expected': {field: tag[field] for field in ('description', 'sku', 'productName', 'price')},
+                'text': '\n'.join(lines) + '\n',
+            })
+        for _ in range(int(noise * 300)):
+            c.circle(rng.uniform(0, letter[0]), rng.uniform(0, letter[1]), rng.uniform(0.3, 1.2), stroke=0, fill=1)
+        c.showPage()
+    c.save()
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help="PDF to write")
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--noise', type=float, default=0.0, help="0 (clean) to 1 (very noisy)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--expected', help="Also write the tag records (expected fields and printed text) to this JSON file")
+    args = parser.parse_args(argv)
+
+    records = make_tag_sheets(args.output, args.pages, args.noise, args.seed)
+    if args.expected:
+        with open(args.expected, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=1)
+    print(f"Wrote {len(records)} tags on {args.pages} pages to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Streamlit-free core of the Price Tag Generator"""
@@ -0,0 +1,105 @@
+"""Barcode encoding and drawing for tags, memoized by value and symbology"""
+from collections import namedtuple
+from functools import lru_cache
+from string import ascii_lowercase, ascii_uppercase
+
+from reportlab.graphics.barcode import code128
+from reportlab.lib.units import inch
+
+BARCODE_SYMBOLOGIES = {'Code128': code128.Code128}
+DEFAULT_BARCODE_TYPE = 'Code128'
+BARCODE_CACHE_SIZE = 65536
+MIN_BAR_WIDTH = 0.0075 * inch  # 7.5 mil, the narrowest bar scanners read reliably
+MAX_BAR_WIDTH = 0.013 * inch
+QUIET_ZONE_MODULES = 10  # Blank bar widths needed on either side of the symbol
+BARCODE_FORM_PREFIX = 'barcode_'
+# Code 128 needs at most 11 modules per printable ASCII character plus 35 for start, check and stop symbols
+CODE128_MODULES_PER_CHAR = 11
+CODE128_FIXED_MODULES = 35
+
+# bars: (start, width) of each dark bar in modules; modules: symbol width without quiet zones
+BarcodePattern = namedtuple('BarcodePattern', ['bars', 'modules'])
+
+@lru_cache(maxsize=BARCODE_CACHE_SIZE)
+def encode_barcode(value, symbology=DEFAULT_BARCODE_TYPE):
+    """BarcodePattern of value in the given symbology, or None if it cannot be encoded"""
+    barcode_class = BARCODE_SYMBOLOGIES.get(symbology)
+    if barcode_class is None or not value:
+        return None
+    barcode = barcode_class(value, quiet=0)
+    try:
+        barcode.validate()
+        if not barcode.valid:
+            return None
+        barcode.encode()
+        barcode.decompose()
+    except (ValueError, KeyError, IndexError):
+        return None
+    # decomposed alternates bars (upper case) and spaces (lower case), 'A' / 'a' being one module wide
+    bars = []
+    position = 0
+    for char in barcode.decomposed:
+        if char in ascii_uppercase:
+            width = ord(char) - ord('A') + 1
+            bars.append((position, width))
+            position += width
+        elif char in ascii_lowercase:
+            position += ord(char) - ord('a') + 1
+    return BarcodePattern(tuple(bars), position)
+
+def barcode_box(tag_width, tag_height):
+    """(x, y, width, height) of the barcode area within a tag, from its bottom left corner
+
+    The right half of the tag, between the product name and the blue bar; the
+    model number and price move to the left half.
+    """
+    scale = tag_height / (1.5 * inch)
+    return tag_width / 2, 0.38 * inch * scale, tag_width / 2 - 0.1 * inch * scale, 0.5 * inch * scale
+
+def bar_width(pattern, width):
+    """Bar width that fits pattern and its quiet zones into width, or None if even MIN_BAR_WIDTH is too wide"""
+    fitted = min(MAX_BAR_WIDTH, width / (pattern.modules + 2 * QUIET_ZONE_MODULES))
+    return fitted if fitted >= MIN_BAR_WIDTH else None
+
+def barcode_issue(value, symbology=DEFAULT_BARCODE_TYPE, width=None):
+    """Why value cannot be printed as a barcode (in width points, if given), or None if it can
+
+    Short printable ASCII values always fit a Code 128 barcode, so they are
+    cleared without encoding them; rendering encodes them when it needs to.
+    """
+    if symbology == 'Code128' and value and value.isascii() and value.isprintable():
+        modules = CODE128_MODULES_PER_CHAR * len(value) + CODE128_FIXED_MODULES
+        if width is None or bar_width(BarcodePattern((), modules), width) is not None:
+            return None
+    pattern = encode_barcode(value, symbology)
+    if pattern is None:
+        return f"'{value}' cannot be encoded as {symbology}"
+    if width is not None and bar_width(pattern, width) is None:
+        return f"'{value}' is too long for a {symbology} barcode on this tag"
+    return None
+
+def draw_barcode(c, value, symbology, x, y, width, height, forms):
+    """Draw value's barcode centered in the box at (x, y); False if it cannot be encoded or does not fit
+
+    forms maps the values already drawn in this document (with this box size)
+    to their form names, and is updated here.
+    """
+    name = forms.get(value)
+    if name is None:
+        pattern = encode_barcode(value, symbology)
+        bar = pattern and bar_width(pattern, width)
+        if not bar:
+            return False
+        name = forms[value] = f"{BARCODE_FORM_PREFIX}{len(forms)}"
+        left = (width - pattern.modules * bar) / 2
+        c.beginForm(name, 0, 0, width, height)
+        path = c.beginPath()
+        for start, modules in pattern.bars:
+            path.rect(left + start * bar, 0, modules * bar, height)
+        c.drawPath(path, stroke=0, fill=1)
+        c.endForm()
+    c.saveState()
+    c.translate(x, y)
+    c.doForm(name)
+    c.restoreState()
+    return True
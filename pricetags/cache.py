@@ -0,0 +1,152 @@
+"""Parsed-tag cache for whole PDFs, keyed by file content and OCR settings"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from pricetags.extraction import extract_text_from_pdf
+from pricetags.ocr import BLANK_INK_LEVEL, BLANK_INK_RATIO, OCR_DPI, OCR_DPI_LADDER, TESSERACT_CONFIG, ZONE_CONFIGS
+from pricetags.reporting import add_to_debug_log
+
+OCR_CACHE_VERSION = 1  # Bump when parsing changes so stale cached tags are not reused
+OCR_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'tagger_ocr_cache')
+OCR_CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+OCR_CACHE_MAX_MEMORY_ENTRIES = 32
+
+class OcrResultCache:
+    """Parsed OCR tags keyed by PDF content and OCR settings, kept in memory and on disk"""
+
+    def __init__(self, cache_dir, max_disk_bytes, max_memory_entries):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()  # key -> JSON string, oldest first
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(pdf_bytes, **settings):
+        """Hash the uploaded bytes together with the settings that affect OCR output"""
+        digest = hashlib.sha256(pdf_bytes)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Return a fresh copy of the cached tags, or None on a miss"""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                return json.loads(payload)
+
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = f.read()
+            os.utime(path)  # Mark as recently used for eviction
+            tags = json.loads(payload)
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, payload)
+        return tags
+
+    def put(self, key, tags):
+        """Store tags in both layers, evicting the least recently used entries"""
+        payload = json.dumps(tags)
+        self._remember(key, payload)
+
+        # Write atomically so a concurrent reader never sees a partial file
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict_disk()
+
+    def _remember(self, key, payload):
+        with self._lock:
+            self._memory[key] = payload
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        # Remove oldest entries first until we are back under the size limit
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+def ocr_cache_key(pdf_bytes, dpi=OCR_DPI, **settings):
+    """Cache key for an uploaded PDF under the current OCR settings
+    
+    settings are the extract_text_from_pdf options that change its output.
+    """
+    return OcrResultCache.make_key(
+        pdf_bytes,
+        dpi=dpi,
+        dpi_ladder=OCR_DPI_LADDER,
+        tesseract_config=TESSERACT_CONFIG,
+        blank_ink_level=BLANK_INK_LEVEL,
+        blank_ink_ratio=BLANK_INK_RATIO,
+        zone_configs=ZONE_CONFIGS,
+        version=OCR_CACHE_VERSION,
+        **settings
+    )
+
+def extract_tags_cached(pdf_bytes, cache_key, cache=None, **extract_options):
+    """Return parsed tags for the PDF, running OCR only on a cache miss (always without a cache)"""
+    tags = cache.get(cache_key) if cache is not None else None
+    if tags is not None:
+        add_to_debug_log(f"OCR cache hit for {cache_key[:12]}: {len(tags)} tags")
+        return tags
+
+    if cache is not None:
+        add_to_debug_log(f"OCR cache miss for {cache_key[:12]}")
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+        tmp_file.write(pdf_bytes)
+        tmp_file_path = tmp_file.name
+
+    try:
+        tags = extract_text_from_pdf(tmp_file_path, **extract_options)
+    finally:
+        try:
+            os.unlink(tmp_file_path)
+        except OSError:
+            pass
+
+    # Empty results are usually errors and cancelled runs are partial, so don't pin them in the cache
+    cancel_event = extract_options.get('cancel_event')
+    if cache is not None and tags and not (cancel_event is not None and cancel_event.is_set()):
+        cache.put(cache_key, tags)
+    return tags
@@ -0,0 +1,195 @@
+"""Command-line batch runs: extract tags from PDFs or import tag files, then write tag PDFs and JSON
+
+    python -m pricetags sheets/*.pdf 4x1.5/Tags.json erp.csv -o out/ [--workers 8] [--dpi 300]
+                        [--pages-per-file 200] [--render-workers 8] [--log run.jsonl]
+
+For every input <name>.pdf / .json / .jsonl / .csv this writes
+out/<name>_tags.json (in the Tags.json layout) and out/<name>_tags.pdf, or
+out/<name>_tags_partNNN.pdf files when --pages-per-file is set. Tags are
+imposed as many to a letter sheet as fit (2 x 7 for 4x1.5" tags); a Tags.json
+'tagSize' and 'settings' block set the tag size, fonts, sheet margin ('margin',
+in inches) and crop marks of its PDF, and --tag-size / --crop-marks override them. Only complete tags
+are printed unless --include-incomplete is given. With --log every debug event is appended to
+a JSONL file and the per-stage timings are summarized on stderr at the end.
+
+With --price-feed FEED every input is repriced from the feed (matched by SKU,
+then barcode): the JSON gets the new prices and the PDF holds only the tags
+whose price changed. Last week's out/<name>_tags.json is the natural input:
+
+    python -m pricetags out/sheet_tags.json --price-feed prices.csv -o week42/
+The exit status is 1 if any input gave no tags.
+"""
+import argparse
+import json
+import os
+import sys
+
+from pricetags.cache import (OCR_CACHE_DIR, OCR_CACHE_MAX_DISK_BYTES, OCR_CACHE_MAX_MEMORY_ENTRIES, OcrResultCache,
+                             extract_tags_cached, ocr_cache_key)
+from pricetags.extraction import DEFAULT_OCR_WORKERS, OCR_BACKENDS, OCR_PAGE_WINDOW
+from pricetags.importing import import_tags, open_tag_file, tag_file_format
+from pricetags.ocr import OCR_DPI
+from pricetags.quarter_store import QuarterOcrStore
+from pricetags.repricing import apply_price_delta, diff_prices, load_price_feed
+from pricetags.imposition import DEFAULT_TAG_SIZE, TAG_SIZES, impose
+from pricetags.rendering import DEFAULT_RENDER_WORKERS, tag_settings_from_json, write_tag_pdfs
+from pricetags import reporting
+from pricetags.reporting import EventLog, format_event
+from pricetags.store import TAG_FIELDS, TagStore
+
+def load_tag_file(path):
+    """Read the tags of a Tags.json, JSONL or CSV file, and its other top-level keys ('settings', 'tagSize', 'template')"""
+    tags = []
+    with open_tag_file(path) as f:
+        _, meta = import_tags(f, tag_file_format(path), tags)
+    return tags, meta
+
+def write_tags_json(tags, path, settings=None, tag_size=DEFAULT_TAG_SIZE, template=None):
+    """Write tags in the Tags.json layout, without the editor's private fields"""
+    data = {
+        'tagSize': tag_size,
+        'tags': [{field: tag.get(field, '') for field in TAG_FIELDS} for tag in tags],
+    }
+    if template is not None:
+        data['template'] = template
+    if settings:
+        data['settings'] = settings
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+
+def extract_pdf_tags(path, args, cache, quarter_store=None):
+    with open(path, 'rb') as f:
+        pdf_bytes = f.read()
+    settings = {
+        'use_text_layer': not args.no_text_layer,
+        'adaptive_dpi': args.adaptive_dpi,
+        'zone_ocr': args.zone_ocr,
+    }
+    return extract_tags_cached(
+        pdf_bytes,
+        ocr_cache_key(pdf_bytes, dpi=args.dpi, **settings),
+        cache=cache,
+        quarter_store=quarter_store,
+        workers=args.workers,
+        page_window=args.page_window,
+        ocr_backend=args.ocr_backend,
+        dpi=args.dpi,
+        **settings
+    )
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m pricetags', description=__doc__.split('\n')[0])
+    parser.add_argument('inputs', nargs='+', help="Source PDFs and/or Tags.json, JSONL or CSV tag files")
+    parser.add_argument('-o', '--output-dir', default='.', help="Directory for the tag PDFs and JSON (default: .)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_OCR_WORKERS, help="Page quarters to OCR in parallel")
+    parser.add_argument('--dpi', type=int, default=OCR_DPI, help="OCR rasterization resolution")
+    parser.add_argument('--adaptive-dpi', action='store_true', help="OCR at low resolution first, retry failing quarters at --dpi")
+    parser.add_argument('--ocr-backend', choices=list(OCR_BACKENDS), default='per-quarter')
+    parser.add_argument('--zone-ocr', action='store_true', help="Learn field zones and OCR only those regions")
+    parser.add_argument('--no-text-layer', action='store_true', help="Ignore embedded PDF text and OCR every quarter")
+    parser.add_argument('--page-window', type=int, default=OCR_PAGE_WINDOW, help="Pages rasterized and held in memory at once")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the shared OCR cache and quarter store")
+    parser.add_argument('--pages-per-file', type=int, default=0, help="Split tag PDFs into files of this many pages (0: one file)")
+    parser.add_argument('--render-workers', type=int, default=DEFAULT_RENDER_WORKERS, help="Processes used to render large PDFs")
+    parser.add_argument('--tag-size', help=f"Tag size in inches, e.g. {', '.join(TAG_SIZES)} (default: the file's tagSize or {DEFAULT_TAG_SIZE})")
+    parser.add_argument('--crop-marks', action='store_true', help="Draw crop marks in the sheet margin")
+    parser.add_argument('--include-incomplete', action='store_true', help="Also print tags with missing fields")
+    parser.add_argument('--price-feed', metavar='FEED', help="Reprice the tags from this CSV, JSONL or Tags.json feed and print only the changed ones")
+    parser.add_argument('--json-only', action='store_true', help="Write the tag JSON but no PDFs")
+    parser.add_argument('--log', metavar='PATH', help="Append every debug event to this JSONL file and summarize stage timings")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Print the debug log to stderr")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.tag_size:
+        try:
+            impose(args.tag_size)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        os.makedirs(args.output_dir, exist_ok=True)
+        if args.log:
+            os.makedirs(os.path.dirname(args.log) or '.', exist_ok=True)
+        event_log = EventLog(path=args.log) if args.log else None
+    except OSError as e:
+        parser.error(str(e))
+    
+    def log(event):
+        if event_log is not None:
+            event_log.add(event)
+        if args.verbose:
+            print(format_event(event), file=sys.stderr)
+    
+    reporting.set_handlers(log=log if args.verbose or event_log is not None else None)
+    cache = quarter_store = None  # Opened with the first PDF, so tag file imports never touch them
+    price_feed = None
+    if args.price_feed:
+        try:
+            with open_tag_file(args.price_feed) as f:
+                price_feed = load_price_feed(f, tag_file_format(args.price_feed))
+        except (OSError, ValueError) as e:
+            print(f"{args.price_feed}: {e}", file=sys.stderr)
+            return 1
+
+    failed = 0
+    for path in args.inputs:
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            if path.lower().endswith('.pdf'):
+                if cache is None and not args.no_cache:
+                    cache = OcrResultCache(OCR_CACHE_DIR, OCR_CACHE_MAX_DISK_BYTES, OCR_CACHE_MAX_MEMORY_ENTRIES)
+                    quarter_store = QuarterOcrStore()
+                tags, meta = extract_pdf_tags(path, args, cache, quarter_store), {}
+            else:
+                tags, meta = load_tag_file(path)
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+
+        if not tags:
+            print(f"{path}: no tags found", file=sys.stderr)
+            failed += 1
+            continue
+
+        to_print = tags
+        delta = None
+        if price_feed is not None:
+            store = TagStore(tags)
+            delta = diff_prices(store, price_feed)
+            changed = apply_price_delta(store, delta)
+            tags = store.to_dicts()
+            to_print = [tags[idx] for idx in changed]
+
+        file_settings = meta.get('settings')
+        tag_settings = tag_settings_from_json(file_settings, tag_size=args.tag_size or meta.get('tagSize'))
+        if args.crop_marks:
+            tag_settings = tag_settings._replace(crop_marks=True)
+        json_path = os.path.join(args.output_dir, f"{name}_tags.json")
+        write_tags_json(tags, json_path, file_settings, tag_settings.tag_size, meta.get('template'))
+        printable = to_print if args.include_incomplete else [tag for tag in to_print if not tag.get('_missing_fields')]
+        incomplete = len(tags) - sum(1 for tag in tags if not tag.get('_missing_fields'))
+        pdf_paths = []
+        if printable and not args.json_only:
+            pdf_paths = write_tag_pdfs(printable, args.output_dir, args.pages_per_file, base_name=f"{name}_tags",
+                                       workers=args.render_workers, settings=tag_settings)
+        print(f"{path}: {len(tags)} tags ({incomplete} incomplete) -> {json_path}"
+              + (f", {len(printable)} printed in {len(pdf_paths)} PDF file(s)" if pdf_paths else ""))
+        if delta is not None:
+            print(f"{path}: {len(delta.changed)} repriced, {delta.unchanged} unchanged, {len(delta.removed)} not in the feed, "
+                  f"{len(delta.added)} feed item(s) without a tag")
+
+    if event_log is not None:
+        stage_rows, pages_per_second = event_log.summary()
+        for row in stage_rows:
+            print(f"{row['stage']:>10}: {row['count']} x p50 {row['p50_ms']} ms, p95 {row['p95_ms']} ms, "
+                  f"total {row['total_s']} s", file=sys.stderr)
+        if pages_per_second:
+            print(f"{pages_per_second:.2f} pages/sec extracted", file=sys.stderr)
+    if quarter_store is not None and args.verbose:
+        stats = quarter_store.stats()
+        print(f"Quarter store: {stats['hits']} reused, {stats['misses']} OCRed, {stats['entries']} stored", file=sys.stderr)
+    
+    return 1 if failed else 0
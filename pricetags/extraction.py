@@ -0,0 +1,387 @@
+"""Tag extraction from PDFs: embedded text layer first, then windowed, optionally parallel OCR"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PyPDF2 import PdfReader
+
+from pricetags import parsing as tag_parsing
+from pricetags.ocr import (BLANK_INK_RATIO, OCR_DPI, OCR_DPI_LADDER, ZoneOcr, ocr_quarter, ocr_quarter_batch,
+                           split_image_into_quarters, submit_page_quarters, submit_page_quarters_batched, timed_ocr)
+from pricetags.reporting import add_to_debug_log, notify_user, record_timing, timed
+
+DEFAULT_OCR_WORKERS = os.cpu_count() or 1
+OCR_BACKENDS = {
+    'per-quarter': "Per quarter (one tesseract call each)",
+    'batched': "Batched (one tesseract call per group of quarters)",
+}
+OCR_PAGE_WINDOW = 4  # Pages rasterized and held in memory at once
+TEXT_LAYER_LINE_TOLERANCE = 2.0  # Points; text fragments closer than this vertically share a line
+
+def parse_single_tag(text):
+    """Parse text from a single tag"""
+    try:
+        return tag_parsing.parse_single_tag(text, log=add_to_debug_log)
+    except Exception as e:
+        notify_user('error', f"Error parsing tag: {str(e)}")
+        return None
+
+def process_quarter_text(text, quarter_num, page_num=None):
+    """Log and parse the OCR text of a single quarter (None for a skipped blank quarter)"""
+    if text is None:
+        add_to_debug_log(f"Quarter {quarter_num + 1} is blank, skipped OCR")
+        return None
+    
+    # Add to debug log instead of showing directly
+    add_to_debug_log(f"Quarter {quarter_num + 1} Text:\n{text}\n")
+    
+    # Parse the text for this quarter
+    with timed('parse', page=page_num, quarter=quarter_num + 1):
+        tag = parse_single_tag(text)
+    return tag
+
+def process_zoned_quarter(zone_ocr, result, get_image, quarter_num, page_num=None):
+    """Parse a ZoneOcr result, re-reading the full quarter when the zones miss fields"""
+    if result is None:
+        return process_quarter_text(None, quarter_num)
+    
+    tag = process_quarter_text(result['text'], quarter_num, page_num)
+    if result['lines'] is None and (not tag or tag.get('_missing_fields')):
+        # The learned zones do not fit this tag, read the whole quarter and relearn from it
+        add_to_debug_log(f"OCR zones missed fields in quarter {quarter_num + 1}, reading the full quarter")
+        with timed('ocr', page=page_num, quarter=quarter_num + 1):
+            result = zone_ocr.ocr(get_image(), blank_threshold=0, full=True)
+        tag = process_quarter_text(result['text'], quarter_num, page_num)
+    
+    zone_ocr.learn(result, tag)
+    if tag:
+        tag['_confidence'] = result['confidence']
+    return tag
+
+def get_pdf_page_count(pdf_path):
+    """Read the page count from the PDF without rasterizing it"""
+    info = pdfinfo_from_path(pdf_path)
+    return int(info.get('Pages', 0))
+
+def iter_page_windows(pdf_path, page_indices, window_size, thread_count=1, dpi=OCR_DPI):
+    """Rasterize the given pages a window at a time
+    
+    Consecutive pages are rendered together in runs of at most window_size and
+    each run is yielded as (page_indices, images), so only that many page images
+    are alive at once, however long the document is.
+    """
+    runs = []
+    for page_idx in page_indices:
+        if runs and page_idx == runs[-1][-1] + 1 and len(runs[-1]) < window_size:
+            runs[-1].append(page_idx)
+        else:
+            runs.append([page_idx])
+    
+    for run in runs:
+        with timed('rasterize', count=len(run), page=run[0] + 1):
+            images = convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                fmt='png',
+                first_page=run[0] + 1,
+                last_page=run[-1] + 1,
+                thread_count=thread_count
+            )
+        yield run, images
+
+def text_fragments_to_lines(fragments):
+    """Join positioned (y, x, text) fragments into lines, top to bottom and left to right"""
+    lines = []
+    current = []
+    current_y = None
+    for y, x, text in sorted(fragments, key=lambda f: (-f[0], f[1])):
+        if current and abs(current_y - y) > TEXT_LAYER_LINE_TOLERANCE:
+            lines.append(' '.join(current))
+            current = []
+        if not current:
+            current_y = y
+        current.append(text)
+    if current:
+        lines.append(' '.join(current))
+    return '\n'.join(lines)
+
+def read_text_layer_quarters(page):
+    """Bucket a page's embedded text into the same four quarters as split_image_into_quarters"""
+    x0, y0, x1, y1 = [float(v) for v in page.mediabox]
+    mid_x = (x0 + x1) / 2
+    mid_y = (y0 + y1) / 2
+    fragments = [[], [], [], []]
+    
+    def visitor(text, cm, tm, font_dict, font_size):
+        if not text.strip():
+            return
+        # Text origin in page space: text matrix translation mapped through the CTM
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        # PDF y grows upwards, so the top quarters are the ones above the middle
+        quarter = (0 if y >= mid_y else 2) + (0 if x < mid_x else 1)
+        line_height = float(font_size or 12)
+        for k, part in enumerate(p for p in text.split('\n') if p.strip()):
+            fragments[quarter].append((y - k * line_height, x, part.strip()))
+    
+    page.extract_text(visitor_text=visitor)
+    return [text_fragments_to_lines(f) for f in fragments]
+
+def tag_quality(tag):
+    """Rank a parse result so a retry only replaces it with a better one"""
+    if not tag:
+        return -1
+    return -len(tag.get('_missing_fields', []))
+
+def record_quarter_tag(results, tag, page_idx, quarter_idx):
+    """Store the parsed tag (or None) for a quarter and log the outcome"""
+    i, j = page_idx, quarter_idx
+    previous = results.get((i, j))
+    if previous and tag_quality(previous) > tag_quality(tag):
+        add_to_debug_log(f"Keeping earlier result for page {i+1}, quarter {j+1}; retry was not better")
+        return
+    results[(i, j)] = tag
+    if tag: # parse_single_tag now returns a dict (even with missing fields) or None
+        tag['selected_for_print'] = False # Initialize selection state
+        if not tag.get('_missing_fields'):
+            add_to_debug_log(f"Successfully extracted complete tag: {tag.get('sku', 'N/A')} on page {i+1}, quarter {j+1}")
+        else:
+            add_to_debug_log(f"Extracted tag with missing fields: {tag.get('sku', 'N/A')}, Missing: {tag['_missing_fields']} on page {i+1}, quarter {j+1}")
+    else:
+        # This 'else' means parse_single_tag returned None, indicating not a valid tag segment
+        add_to_debug_log(f"Skipping invalid/empty segment in page {i+1}, quarter {j+1}")
+
+def extract_from_text_layer(pdf_path, page_count, results):
+    """Parse tags from the PDF's embedded text layer
+    
+    Fills results for every quarter whose text yields a tag and returns
+    {page_idx: [quarter_idx, ...]} for the quarters that still need OCR,
+    including those whose tag is missing fields (kept unless OCR does no worse).
+    """
+    all_quarters = {i: [0, 1, 2, 3] for i in range(page_count)}
+    try:
+        reader = PdfReader(pdf_path)
+    except Exception as e:
+        add_to_debug_log(f"Could not open text layer, falling back to OCR: {str(e)}")
+        return all_quarters
+    
+    needs_ocr = {}
+    for i, page in enumerate(reader.pages):
+        try:
+            quarter_texts = read_text_layer_quarters(page)
+        except Exception as e:
+            add_to_debug_log(f"Could not read text layer on page {i+1}: {str(e)}")
+            needs_ocr[i] = [0, 1, 2, 3]
+            continue
+        
+        for j, text in enumerate(quarter_texts):
+            tag = None
+            if text.strip():
+                with timed('parse', page=i + 1, quarter=j + 1):
+                    tag = parse_single_tag(text)
+            if tag:
+                add_to_debug_log(f"Page {i+1} Quarter {j+1} Text (text layer):\n{text}\n")
+                record_quarter_tag(results, tag, i, j)
+            if not tag or tag.get('_missing_fields'):
+                needs_ocr.setdefault(i, []).append(j)
+    
+    found = sum(1 for tag in results.values() if tag and not tag.get('_missing_fields'))
+    ocr_count = sum(len(quarters) for quarters in needs_ocr.values())
+    add_to_debug_log(f"Text layer gave {found} complete tags; {ocr_count} quarters on {len(needs_ocr)} pages need OCR")
+    return needs_ocr
+
+class ExtractionCancelled(Exception):
+    """Raised inside an extraction when its cancel event is set"""
+
+def ocr_pdf_quarters(pdf_path, page_quarters, results, executor=None, page_window=OCR_PAGE_WINDOW,
+                     thread_count=1, blank_threshold=BLANK_INK_RATIO, dpi=OCR_DPI, zone_ocr=None,
+                     ocr_backend='per-quarter', batches=1, on_page_done=None, cancel_event=None, quarter_store=None):
+    """OCR the {page_idx: [quarter_idx, ...]} quarters into results; returns the ones worth retrying in the same shape"""
+    blank_count = 0
+    stored_count = 0
+    retry = {}
+    ocr_fn = zone_ocr.ocr if zone_ocr is not None else ocr_quarter
+    batch_fn = ocr_quarter_batch
+    use_store = quarter_store is not None and zone_ocr is None
+    if use_store:
+        # Hashing and the store lookup run with the OCR, on the workers when there is an executor
+        ocr_fn = quarter_store.reusing(ocr_fn)
+        batch_fn = quarter_store.reusing_batch(batch_fn)
+    windows = iter_page_windows(pdf_path, sorted(page_quarters), page_window, thread_count=thread_count, dpi=dpi)
+    for page_indices, images in windows:
+        wanted = [page_quarters[i] for i in page_indices]
+        
+        pending = None
+        if executor is not None and ocr_backend == 'batched' and zone_ocr is None:
+            pending = submit_page_quarters_batched(executor, images, wanted, blank_threshold, batches, batch_fn)
+        elif executor is not None:
+            pending = submit_page_quarters(executor, images, wanted, blank_threshold, ocr_fn, page_indices)
+        
+        for offset, i in enumerate(page_indices):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExtractionCancelled()
+            add_to_debug_log(f"\nProcessing page {i+1} at {dpi} DPI")
+            
+            try:
+                # Split image into quarters (already queued for OCR in parallel mode)
+                if pending is not None:
+                    quarters = pending[offset]
+                    if isinstance(quarters, Exception):
+                        raise quarters
+                else:
+                    quarters = split_image_into_quarters(images[offset])
+                
+                # Process each wanted quarter
+                for j in wanted[offset]:
+                    try:
+                        if pending is not None:
+                            result = quarters[j].result()
+                        else:
+                            result = timed_ocr(ocr_fn, i, j)(quarters[j], blank_threshold)
+                        key = stored = None
+                        if use_store:
+                            key, stored, result = result
+                        if stored is not None:
+                            result, tag = stored
+                            stored_count += 1
+                            add_to_debug_log(f"Quarter {j + 1} Text (shared OCR store):\n{result}\n")
+                        else:
+                            if result is None:
+                                blank_count += 1
+                            if zone_ocr is not None:
+                                reread = lambda image=images[offset], j=j: split_image_into_quarters(image)[j]
+                                tag = process_zoned_quarter(zone_ocr, result, reread, j, i + 1)
+                            else:
+                                tag = process_quarter_text(result, j, i + 1)
+                            if key is not None and result is not None:
+                                quarter_store.put(key, result, tag)
+                        record_quarter_tag(results, tag, i, j)
+                        if result is not None and (not tag or tag.get('_missing_fields')):
+                            retry.setdefault(i, []).append(j)
+                    except Exception as e:
+                        add_to_debug_log(f"Error processing quarter {j+1} on page {i+1}: {str(e)}")
+                        continue
+                        
+            except Exception as e:
+                add_to_debug_log(f"Error processing page {i+1}: {str(e)}")
+            finally:
+                # Release the page and its quarters as soon as they are parsed
+                images[offset] = None
+                if pending is not None:
+                    pending[offset] = None
+            
+            if on_page_done is not None:
+                on_page_done(i, len(wanted[offset]), retry)
+        
+        del images, pending
+    
+    add_to_debug_log(f"Skipped OCR on {blank_count} blank quarters at {dpi} DPI")
+    if use_store:
+        add_to_debug_log(f"Reused {stored_count} quarters from the shared OCR store at {dpi} DPI")
+    return retry
+
+def extract_text_from_pdf(pdf_path, workers=1, page_window=OCR_PAGE_WINDOW, use_text_layer=True,
+                          blank_threshold=BLANK_INK_RATIO, adaptive_dpi=False, zone_ocr=False,
+                          ocr_backend='per-quarter', dpi=OCR_DPI, progress=None, cancel_event=None, quarter_store=None):
+    """Extract tags from the quarters of every PDF page, from the text layer where possible and by OCR otherwise"""
+    results = {}  # (page_idx, quarter_idx) -> parsed tag or None
+    executor = None
+    started = time.perf_counter()
+    
+    try:
+        add_to_debug_log(f"Processing PDF: {pdf_path}")
+        page_count = get_pdf_page_count(pdf_path)
+        
+        if not page_count:
+            error_msg = "No pages found in PDF"
+            add_to_debug_log(f"Error: {error_msg}")
+            notify_user('error', error_msg)
+            return []
+        
+        if use_text_layer:
+            page_quarters = extract_from_text_layer(pdf_path, page_count, results)
+        else:
+            page_quarters = {i: [0, 1, 2, 3] for i in range(page_count)}
+        
+        progress_state = {
+            'done': page_count * 4 - sum(len(quarters) for quarters in page_quarters.values()),
+            'total': page_count * 4,
+            'remaining': set(page_quarters),
+        }
+        
+        def publish_progress(retry):
+            if progress is None:
+                return
+            # Pages still queued in this pass or for a retry may still gain or change tags
+            frontier = min(progress_state['remaining'] | set(retry), default=page_count)
+            stable_tags = [results[key] for key in sorted(results) if key[0] < frontier and results[key]]
+            progress(progress_state['done'], progress_state['total'], stable_tags)
+        
+        def on_page_done(page_idx, quarter_count, retry):
+            progress_state['remaining'].discard(page_idx)
+            progress_state['done'] += quarter_count
+            publish_progress(retry)
+        
+        publish_progress({})
+        
+        if page_quarters:
+            if workers > 1 or ocr_backend == 'batched':
+                # Each tesseract process should use one core, the pool provides the parallelism
+                os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+                executor = ThreadPoolExecutor(max_workers=workers)
+                # Keep the window big enough to give every worker a quarter
+                page_window = max(page_window, -(-workers // 4))
+            add_to_debug_log(f"OCR needed on {len(page_quarters)} of {page_count} pages, rasterizing {page_window} at a time")
+        
+        zones = ZoneOcr() if zone_ocr else None
+        dpi_ladder = (dpi,)
+        if adaptive_dpi:
+            dpi_ladder = tuple(step for step in OCR_DPI_LADDER if step < dpi) + dpi_ladder
+        try:
+            for step, dpi in enumerate(dpi_ladder):
+                if not page_quarters:
+                    break
+                if step:
+                    retry_count = sum(len(quarters) for quarters in page_quarters.values())
+                    add_to_debug_log(f"Retrying {retry_count} quarters on {len(page_quarters)} pages at {dpi} DPI")
+                    progress_state['total'] += retry_count
+                    progress_state['remaining'] = set(page_quarters)
+                page_quarters = ocr_pdf_quarters(
+                    pdf_path,
+                    page_quarters,
+                    results,
+                    executor=executor,
+                    page_window=page_window,
+                    thread_count=min(workers, page_window),
+                    blank_threshold=blank_threshold,
+                    dpi=dpi,
+                    zone_ocr=zones,
+                    ocr_backend=ocr_backend,
+                    batches=workers,
+                    on_page_done=on_page_done,
+                    cancel_event=cancel_event,
+                    quarter_store=quarter_store
+                )
+        except ExtractionCancelled:
+            add_to_debug_log("Extraction cancelled, keeping the tags found so far")
+        else:
+            record_timing('extract', time.perf_counter() - started, count=page_count)
+        
+        all_tags = [results[key] for key in sorted(results) if results[key]]
+                
+        if not all_tags:
+            error_msg = "No valid tags found in the PDF. Check if the format matches the expected layout."
+            add_to_debug_log(f"Error: {error_msg}")
+            notify_user('warning', error_msg)
+            
+    except Exception as e:
+        error_msg = f"Error processing PDF: {str(e)}"
+        add_to_debug_log(f"Critical Error: {error_msg}")
+        notify_user('error', error_msg)
+        return []
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+    return all_tags
@@ -0,0 +1,175 @@
+"""Streaming bulk import of structured tag data (Tags.json, JSONL, CSV), bypassing OCR"""
+import csv
+import json
+import re
+import time
+
+from pricetags.reporting import add_to_debug_log, record_timing
+from pricetags.store import TAG_FIELDS
+from pricetags.validation import refresh_missing_fields
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_FORMATS = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+JSON_CHUNK_SIZE = 1 << 20  # Characters read from a Tags.json file at a time
+# Column names (lowercased, punctuation dropped) -> tag field, so ERP exports map without renaming
+FIELD_ALIASES = {
+    'productname': 'productName', 'product': 'productName', 'name': 'productName',
+    'sku': 'sku', 'model': 'sku', 'modelnumber': 'sku',
+    'price': 'price', 'newprice': 'price',
+    'barcode': 'barcode', 'upc': 'barcode',
+    'description': 'description',
+}
+
+def tag_file_format(filename):
+    """'json', 'jsonl' or 'csv' from a file name's extension"""
+    for extension, fmt in IMPORT_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return fmt
+    raise ValueError(f"Unsupported tag file {filename!r}: expected one of {', '.join(IMPORT_FORMATS)}")
+
+class _JsonStream:
+    """Just enough of an incremental JSON reader to walk a Tags.json document without loading it whole"""
+
+    def __init__(self, f, chunk_size=JSON_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = '' if self.eof else self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it ('' at the end)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def take(self, expected):
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"Malformed JSON: expected {expected!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number running into the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise ValueError("Malformed JSON in tag file") from None
+            self._fill()
+
+    def array(self):
+        """Yield the items of the array starting at the current position"""
+        self.take('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.take(',]') == ']':
+                return
+
+def iter_tags_json(f, meta):
+    """Yield the entries of a Tags.json document's 'tags' array (or of a bare array)
+
+    Other top-level keys ('settings', 'tagSize', ...) are stored in meta as they
+    are reached; 'settings' may follow the tags, so read meta after the entries.
+    """
+    stream = _JsonStream(f)
+    if stream.peek() == '[':
+        yield from stream.array()
+        return
+    stream.take('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.take(':')
+        if key == 'tags' and stream.peek() == '[':
+            yield from stream.array()
+        else:
+            meta[key] = stream.value()
+        if stream.take(',}') == '}':
+            return
+
+def iter_tag_rows(f, fmt, meta=None):
+    """Yield raw row dicts from a text file in the given format ('json', 'jsonl' or 'csv')"""
+    meta = {} if meta is None else meta
+    if fmt == 'json':
+        yield from iter_tags_json(f, meta)
+    elif fmt == 'jsonl':
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        raise ValueError(f"Unsupported tag file format {fmt!r}")
+
+def normalize_row(row):
+    """A tag dict from an imported row, mapping column aliases to the tag fields"""
+    tag = dict.fromkeys(TAG_FIELDS, '')
+    if not isinstance(row, dict):
+        return tag
+    for key, value in row.items():
+        field = FIELD_ALIASES.get(re.sub(r'[^a-z0-9]', '', str(key).lower()))
+        if field is not None and value is not None:
+            tag[field] = str(value).strip()
+    tag['price'] = tag['price'].replace('$', '').strip()
+    return tag
+
+def iter_tag_batches(rows, batch_size=IMPORT_BATCH_SIZE):
+    """Normalize rows into lists of up to batch_size tags with barcodes and '_missing_fields' filled in"""
+    batch = []
+    for row in rows:
+        tag = normalize_row(row)
+        refresh_missing_fields(tag)  # Derives the barcode from the SKU when the row has none
+        tag['selected_for_print'] = False
+        batch.append(tag)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def import_tags(f, fmt, tags, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Stream the tag file f (opened as text) into tags (a TagStore or list)
+
+    progress(count), if given, is called after every batch. Returns the number
+    of imported tags and the file's other top-level keys (Tags.json 'settings'
+    and 'tagSize'; empty for CSV and JSONL).
+    """
+    meta = {}
+    count = 0
+    start = time.perf_counter()
+    for batch in iter_tag_batches(iter_tag_rows(f, fmt, meta), batch_size):
+        tags.extend(batch)
+        count += len(batch)
+        if progress is not None:
+            progress(count)
+    if count:
+        record_timing('import', time.perf_counter() - start, count=count)
+    add_to_debug_log(f"Imported {count} tags from {fmt.upper()}")
+    return count, meta
+
+def open_tag_file(path):
+    """Open a tag file for import (UTF-8, tolerating the BOM spreadsheet exports add)"""
+    return open(path, encoding='utf-8-sig', newline='')
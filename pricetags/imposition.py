@@ -0,0 +1,86 @@
+"""Imposition: how many tags of a stock size fit on a sheet, and where they go"""
+import re
+from collections import namedtuple
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+
+TAG_SIZES = ('4x1.5', '4x2', '3x1.25', '2.25x1.25', '2x1')  # Stock sizes offered in the app, width x height in inches
+DEFAULT_TAG_SIZE = '4x1.5'
+PAGE_SIZE = letter
+MAX_TAG_GAP = 0.2 * inch
+CROP_MARK_LENGTH = 0.125 * inch
+CROP_MARK_OFFSET = inch / 32  # Space between a crop mark and the tag edge it continues
+CROP_MARKS_FORM = 'crop_marks'
+
+def parse_tag_size(tag_size):
+    """(width, height) in points from a 'WxH' size in inches such as '4x1.5' or '4 x 1.5"'"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*["\']{0,2}\s*[xX×]\s*(\d+(?:\.\d+)?)\s*["\']{0,2}\s*', str(tag_size))
+    if not match or not float(match.group(1)) or not float(match.group(2)):
+        raise ValueError(f"Invalid tag size {tag_size!r}: expected width x height in inches, like '4x1.5'")
+    return float(match.group(1)) * inch, float(match.group(2)) * inch
+
+def _axis(space, size, margin):
+    """Count, start offset and gap of tags of `size` laid out along `space` inside `margin`"""
+    usable = space - 2 * margin
+    count = int((usable + 0.001) // size)  # Tolerate rounding when tags fill the space exactly
+    gap = min(MAX_TAG_GAP, max(0.0, usable - count * size) / (count - 1)) if count > 1 else 0.0
+    start = (space - count * size - (count - 1) * gap) / 2
+    return count, start, gap
+
+class Imposition(namedtuple('Imposition', 'page_width page_height tag_width tag_height columns rows left top gap_x gap_y')):
+    """Grid of tag slots on a page; left and top are the grid's distance from the page edges, in points"""
+    __slots__ = ()
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+    def slot_origin(self, slot):
+        """Bottom left corner of the tag in the given slot (0 is top left, then row by row)"""
+        row, column = divmod(slot, self.columns)
+        x = self.left + column * (self.tag_width + self.gap_x)
+        y = self.page_height - self.top - row * (self.tag_height + self.gap_y) - self.tag_height
+        return x, y
+
+def impose(tag_size=DEFAULT_TAG_SIZE, margin=0.25 * inch, page_size=PAGE_SIZE):
+    """The densest Imposition of tag_size tags on page_size inside margin (points); ValueError if none fit"""
+    tag_width, tag_height = parse_tag_size(tag_size)
+    page_width, page_height = page_size
+    columns, left, gap_x = _axis(page_width, tag_width, margin)
+    rows, top, gap_y = _axis(page_height, tag_height, margin)
+    if not columns or not rows:
+        raise ValueError(f"A {tag_size} tag does not fit on a {page_width / inch:g}x{page_height / inch:g} sheet "
+                         f"with a {margin / inch:g} inch margin")
+    return Imposition(page_width, page_height, tag_width, tag_height, columns, rows, left, top, gap_x, gap_y)
+
+def _cut_lines(start, size, gap, count):
+    """Positions of the tag edges along one axis, with shared edges only once"""
+    edges = []
+    for k in range(count):
+        near = start + k * (size + gap)
+        for edge in (near, near + size):
+            if not edges or abs(edge - edges[-1]) > 0.01:
+                edges.append(edge)
+    return edges
+
+def define_crop_marks(c, imposition):
+    """Draw the crop marks of one sheet as a reusable form XObject; False if the margin has no room for them"""
+    imp = imposition
+    length_x = min(CROP_MARK_LENGTH, imp.left - CROP_MARK_OFFSET)
+    length_y = min(CROP_MARK_LENGTH, imp.top - CROP_MARK_OFFSET)
+    if length_x <= 0 or length_y <= 0:
+        return False
+    grid_right = imp.page_width - imp.left
+    grid_top = imp.page_height - imp.top  # The grid is centered, so imp.top is also its bottom margin
+    c.beginForm(CROP_MARKS_FORM, 0, 0, imp.page_width, imp.page_height)
+    c.setLineWidth(0.25)
+    for x in _cut_lines(imp.left, imp.tag_width, imp.gap_x, imp.columns):
+        c.line(x, grid_top + CROP_MARK_OFFSET, x, grid_top + CROP_MARK_OFFSET + length_y)
+        c.line(x, imp.top - CROP_MARK_OFFSET, x, imp.top - CROP_MARK_OFFSET - length_y)
+    for y_from_top in _cut_lines(imp.top, imp.tag_height, imp.gap_y, imp.rows):
+        y = imp.page_height - y_from_top
+        c.line(imp.left - CROP_MARK_OFFSET - length_x, y, imp.left - CROP_MARK_OFFSET, y)
+        c.line(grid_right + CROP_MARK_OFFSET, y, grid_right + CROP_MARK_OFFSET + length_x, y)
+    c.endForm()
+    return True
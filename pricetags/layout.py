@@ -0,0 +1,107 @@
+"""Text measurement and fitting for tag layout, memoized across validation and rendering"""
+from collections import namedtuple
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+
+LAYOUT_CACHE_SIZE = 65536  # Fits / measurements kept per cache
+MIN_FONT_SIZE = 9
+
+# lines and their widths at font_size, ready to center without measuring again
+TextLayout = namedtuple('TextLayout', ['lines', 'font_size', 'widths'])
+
+class GlyphWidths(dict):
+    """Character -> glyph width (1/1000 em) for one font, filled in on first use of each character"""
+    
+    def __init__(self, font_name):
+        super().__init__()
+        font = pdfmetrics.getFont(font_name)
+        self._fonts = [font] + font.substitutionFonts
+        for code in range(32, 256):
+            self[chr(code)] = self.__missing__(chr(code))
+    
+    def __missing__(self, char):
+        # Same lookup pdfmetrics uses, including substitution fonts for characters
+        # the font's encoding lacks; widths stay integers so sums are exact
+        width = sum(sum(map(font.widths.__getitem__, encoded))
+                    for font, encoded in pdfmetrics.unicode2T1(char, self._fonts))
+        self[char] = width
+        return width
+
+_glyph_widths = {}
+
+def glyph_widths(font_name):
+    """Return the (shared) glyph width table for font_name"""
+    table = _glyph_widths.get(font_name)
+    if table is None:
+        table = _glyph_widths[font_name] = GlyphWidths(font_name)
+    return table
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def text_width(text, font_name, font_size):
+    """Width of text in points; identical to pdfmetrics.stringWidth for standard fonts"""
+    return sum(map(glyph_widths(font_name).__getitem__, text)) * 0.001 * font_size
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def fit_text(text, max_width, font_name='Helvetica-Bold', initial_font_size=12):
+    """Split and size text (upper-cased) to fit within max_width, returning a TextLayout
+    
+    Natural split points are tried at the initial font size first, then a
+    split near the middle at decreasing font sizes. The first line may use
+    1.5x max_width and the second 1.2x.
+    """
+    text = text.upper()
+    
+    def layout(lines, font_size):
+        return TextLayout(tuple(lines), font_size, tuple(text_width(line, font_name, font_size) for line in lines))
+    
+    # Function to check if text fits
+    def text_fits(text, font_size, max_width_ratio=1.5):
+        return text_width(text, font_name, font_size) <= max_width * max_width_ratio
+    
+    # Try to find natural split points
+    split_candidates = [
+        # Split before "BAGGED" or "FLAT"
+        lambda t: t.find(", BAGGED"),
+        lambda t: t.find(", FLAT"),
+        # Split before parentheses
+        lambda t: t.find(" ("),
+        # Split after measurements (before descriptive text)
+        lambda t: next((i for i, c in enumerate(t) if c.isalpha() and 
+                       i > 0 and (t[i-1].isdigit() or t[i-1] in 'X/')), -1),
+        # Split at comma
+        lambda t: t.find(","),
+        # Split at last space in first half
+        lambda t: t.rfind(" ", 0, len(t)//2 + 10)
+    ]
+    
+    # Try each split point with original font size
+    font_size = initial_font_size
+    for get_split_point in split_candidates:
+        split_point = get_split_point(text)
+        if split_point > 0:
+            line1 = text[:split_point].strip()
+            line2 = text[split_point:].strip(" ,()")
+            
+            if text_fits(line1, font_size, 1.5) and text_fits(line2, font_size, 1.2):
+                return layout([line1, line2], font_size)
+    
+    # If no good split point found, try reducing font size
+    while font_size >= MIN_FONT_SIZE:
+        # Try splitting at the middle
+        mid_point = len(text) // 2
+        split_point = text.rfind(" ", 0, mid_point + 10)
+        if split_point > 0:
+            line1 = text[:split_point].strip()
+            line2 = text[split_point:].strip()
+            if text_fits(line1, font_size, 1.5) and text_fits(line2, font_size, 1.2):
+                return layout([line1, line2], font_size)
+        font_size -= 1
+    
+    # Last resort: force split at midpoint with smallest font
+    mid_point = len(text) // 2
+    split_point = text.rfind(" ", 0, mid_point + 10)
+    if split_point > 0:
+        return layout([text[:split_point].strip(), text[split_point:].strip()], MIN_FONT_SIZE)
+    
+    return layout([text], MIN_FONT_SIZE)
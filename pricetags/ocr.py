@@ -0,0 +1,329 @@
+"""Page splitting and tesseract OCR of tag quarters (per quarter, batched or by learned zones)"""
+import os
+import shlex
+import subprocess
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pytesseract
+
+from pricetags import parsing as tag_parsing
+from pricetags.parsing import PRODUCT_NAME_EXCLUSIONS
+from pricetags.reporting import add_to_debug_log, timed, with_current_handlers
+
+# OCR settings - anything that changes the OCR output must be part of the cache key
+OCR_DPI = 300
+OCR_DPI_LADDER = (150, OCR_DPI)  # Adaptive mode: start low, re-OCR failing quarters at the next step
+TESSERACT_CONFIG = r'--oem 3 --psm 6'
+BATCH_PAGE_SEPARATOR = '\f'  # tesseract ends each page of a multi-image run with a form feed
+BLANK_INK_LEVEL = 128  # Grayscale values below this count as ink
+BLANK_INK_RATIO = 0.002  # Quarters with a smaller fraction of ink pixels are treated as blank
+# Zone-based OCR: tesseract settings per learned field zone
+ZONE_ORDER = ('description', 'model', 'name', 'price')
+ZONE_CONFIGS = {
+    'description': r'--oem 3 --psm 7',
+    'model': r'--oem 3 --psm 7',
+    'name': r'--oem 3 --psm 6',
+    'price': r'--oem 3 --psm 7 -c tessedit_char_whitelist=$0123456789.,',
+}
+ZONE_TAG_FIELDS = {'description': 'description', 'model': 'sku', 'name': 'productName', 'price': 'price'}
+ZONE_PADDING = 0.02  # Fraction of the quarter size added around each learned zone
+LOW_OCR_CONFIDENCE = 60  # Fields read with a lower mean word confidence are flagged in the editor
+
+def split_image_into_quarters(image):
+    """Split the image into four equal quarters"""
+    width, height = image.size
+    mid_w = width // 2
+    mid_h = height // 2
+    
+    # Split into quarters
+    quarters = [
+        # Top left
+        image.crop((0, 0, mid_w, mid_h)),
+        # Top right
+        image.crop((mid_w, 0, width, mid_h)),
+        # Bottom left
+        image.crop((0, mid_h, mid_w, height)),
+        # Bottom right
+        image.crop((mid_w, mid_h, width, height))
+    ]
+    
+    return quarters
+
+def ink_ratio(image):
+    """Fraction of dark pixels in the image, taken from its grayscale histogram"""
+    histogram = np.asarray(image.convert('L').histogram())
+    return histogram[:BLANK_INK_LEVEL].sum() / max(histogram.sum(), 1)
+
+def is_blank_region(image, threshold=BLANK_INK_RATIO):
+    """Check whether a region has too little ink to hold a tag"""
+    return ink_ratio(image) < threshold
+
+def ocr_quarter(image, blank_threshold=BLANK_INK_RATIO):
+    """Run tesseract on a single quarter and return the raw text (safe to call from worker threads)
+    
+    Returns None without calling tesseract when the quarter is blank.
+    """
+    if blank_threshold and is_blank_region(image, blank_threshold):
+        return None
+    
+    # Convert to RGB if needed
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # Extract text with custom configuration
+    return pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+
+def ocr_words(image, config=TESSERACT_CONFIG):
+    """OCR an image into lines with their text, bounding box and mean word confidence"""
+    data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+    lines = OrderedDict()
+    for k, word in enumerate(data['text']):
+        if not word.strip():
+            continue
+        key = (data['block_num'][k], data['par_num'][k], data['line_num'][k])
+        left, top = data['left'][k], data['top'][k]
+        right, bottom = left + data['width'][k], top + data['height'][k]
+        line = lines.get(key)
+        if line is None:
+            lines[key] = {'words': [word], 'confs': [float(data['conf'][k])], 'box': [left, top, right, bottom]}
+        else:
+            line['words'].append(word)
+            line['confs'].append(float(data['conf'][k]))
+            box = line['box']
+            line['box'] = [min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)]
+    
+    return [
+        {'text': ' '.join(line['words']), 'conf': sum(line['confs']) / len(line['confs']), 'box': line['box']}
+        for line in lines.values()
+    ]
+
+def locate_tag_lines(lines):
+    """Find which OCR lines hold each tag field, using the same rules as parse_single_tag
+    
+    Returns {zone: [line_idx, ...]} for the zones that were found.
+    """
+    texts = [line['text'].strip() for line in lines]
+    zones = {}
+    description_idx = next((i for i, t in enumerate(texts) if 'Hearth >' in t), None)
+    model_idx = next((i for i, t in enumerate(texts) if 'Model #:' in t), None)
+    price_idx = next((i for i, t in enumerate(texts) if tag_parsing.is_price_line(t)), None)
+    
+    if description_idx is not None:
+        zones['description'] = [description_idx]
+    if model_idx is not None:
+        zones['model'] = [model_idx]
+    if price_idx is not None:
+        zones['price'] = [price_idx]
+    if model_idx is not None and price_idx is not None:
+        name_idx = [
+            i for i in range(model_idx + 1, price_idx)
+            if texts[i] and not texts[i].startswith('$')
+            and not any(excluded in texts[i] for excluded in PRODUCT_NAME_EXCLUSIONS)
+        ]
+        if name_idx:
+            zones['name'] = name_idx
+    return zones
+
+def field_confidences(lines):
+    """Mean OCR confidence (0-100) of the lines behind each tag field"""
+    confidence = {}
+    for zone, indices in locate_tag_lines(lines).items():
+        confidence[ZONE_TAG_FIELDS[zone]] = round(sum(lines[i]['conf'] for i in indices) / len(indices))
+    return confidence
+
+def learn_zone_layout(lines, size):
+    """Learn the field zones of a tag as boxes relative to the quarter size
+    
+    Returns None unless the model, name and price zones were all found.
+    """
+    width, height = size
+    zones = locate_tag_lines(lines)
+    if not all(zone in zones for zone in ('model', 'name', 'price')):
+        return None
+    
+    layout = {}
+    for zone, indices in zones.items():
+        left = min(lines[i]['box'][0] for i in indices) / width - ZONE_PADDING
+        top = min(lines[i]['box'][1] for i in indices) / height - ZONE_PADDING
+        right = max(lines[i]['box'][2] for i in indices) / width + ZONE_PADDING
+        bottom = max(lines[i]['box'][3] for i in indices) / height + ZONE_PADDING
+        layout[zone] = tuple(round(v, 3) for v in (max(left, 0.0), max(top, 0.0), min(right, 1.0), min(bottom, 1.0)))
+    return layout
+
+class ZoneOcr:
+    """Zone-based OCR for one document
+    
+    The first complete tag teaches it where the description, model, name and
+    price lines sit in a quarter; later quarters only OCR those crops with a
+    field-specific page segmentation mode and whitelist. ocr() is safe to call
+    from worker threads, learn() must be called from the extraction thread.
+    """
+    
+    def __init__(self):
+        self.layout = None
+    
+    def ocr(self, image, blank_threshold=BLANK_INK_RATIO, full=False):
+        """OCR a quarter, returning None for a blank quarter or a dict with
+        'text', per-field 'confidence', and the full-quarter 'lines' and 'size'
+        ('lines' is None when only the zones were read)"""
+        if blank_threshold and is_blank_region(image, blank_threshold):
+            return None
+        
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        layout = None if full else self.layout
+        if layout is None:
+            lines = ocr_words(image)
+            return {
+                'text': '\n'.join(line['text'] for line in lines),
+                'confidence': field_confidences(lines),
+                'lines': lines,
+                'size': image.size
+            }
+        
+        width, height = image.size
+        text_lines = []
+        confidence = {}
+        for zone in ZONE_ORDER:
+            if zone not in layout:
+                continue
+            left, top, right, bottom = layout[zone]
+            box = (int(left * width), int(top * height), max(int(right * width), int(left * width) + 1),
+                   max(int(bottom * height), int(top * height) + 1))
+            zone_lines = ocr_words(image.crop(box), ZONE_CONFIGS[zone])
+            text_lines.extend(line['text'] for line in zone_lines)
+            if zone_lines:
+                confidence[ZONE_TAG_FIELDS[zone]] = round(sum(line['conf'] for line in zone_lines) / len(zone_lines))
+        
+        return {'text': '\n'.join(text_lines), 'confidence': confidence, 'lines': None, 'size': image.size}
+    
+    def learn(self, result, tag):
+        """Learn the zone layout from a full-quarter result that parsed into a complete tag"""
+        if not result or result['lines'] is None or not tag or tag.get('_missing_fields'):
+            return
+        layout = learn_zone_layout(result['lines'], result['size'])
+        if layout and layout != self.layout:
+            self.layout = layout
+            add_to_debug_log(f"Learned OCR zones: {layout}")
+
+def timed_ocr(ocr_fn, page_idx, quarter_idx):
+    """Wrap ocr_fn(image, blank_threshold) to record an 'ocr' timing for one quarter, on any thread"""
+    def run(image, blank_threshold):
+        with timed('ocr', page=page_idx + 1, quarter=quarter_idx + 1):
+            return ocr_fn(image, blank_threshold)
+    return with_current_handlers(run)
+
+def submit_page_quarters(executor, images, page_quarters, blank_threshold=BLANK_INK_RATIO, ocr_fn=ocr_quarter,
+                         page_indices=None):
+    """Split every page and queue the wanted quarters for OCR on the executor
+    
+    Returns one entry per page: a {quarter_idx: future} dict, or the exception
+    raised while splitting that page. With page_indices (one per image) every
+    quarter's OCR time is recorded.
+    """
+    pending = []
+    for k, (image, wanted) in enumerate(zip(images, page_quarters)):
+        try:
+            quarters = split_image_into_quarters(image)
+            pending.append({
+                j: executor.submit(ocr_fn if page_indices is None else timed_ocr(ocr_fn, page_indices[k], j),
+                                   quarters[j], blank_threshold)
+                for j in wanted
+            })
+        except Exception as e:
+            pending.append(e)
+    return pending
+
+def ocr_images_batched(images, config=TESSERACT_CONFIG):
+    """OCR several images with a single tesseract process reading a file list
+    
+    Returns one text per image, in order. tesseract ends every page of a
+    multi-image run with a form feed, which is used to split the output.
+    """
+    with tempfile.TemporaryDirectory(prefix='tagger_ocr_') as tmp_dir:
+        paths = []
+        for k, image in enumerate(images):
+            path = os.path.join(tmp_dir, f"{k:05d}.png")
+            image.save(path, compress_level=1)
+            paths.append(path)
+        list_path = os.path.join(tmp_dir, 'images.txt')
+        with open(list_path, 'w') as f:
+            f.write('\n'.join(paths) + '\n')
+        
+        command = [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout'] + shlex.split(config)
+        output = subprocess.run(command, capture_output=True, check=True).stdout.decode('utf-8')
+    
+    texts = output.split(BATCH_PAGE_SEPARATOR)
+    if len(texts) < len(images):
+        raise RuntimeError(f"tesseract returned {len(texts)} pages for a batch of {len(images)} images")
+    return texts[:len(images)]
+
+def ocr_quarter_batch(images, blank_threshold=BLANK_INK_RATIO):
+    """OCR a batch of quarters in one tesseract run (safe to call from worker threads)
+    
+    Returns one entry per quarter: its text, None for a blank quarter, or the
+    exception raised for it. If the batched run fails the quarters are OCRed
+    one by one so a single bad image does not sink the whole batch.
+    """
+    results = [None] * len(images)
+    inked = [k for k, image in enumerate(images) if not (blank_threshold and is_blank_region(image, blank_threshold))]
+    if not inked:
+        return results
+    
+    try:
+        with timed('ocr', count=len(inked)):
+            texts = ocr_images_batched([images[k].convert('RGB') for k in inked])
+    except Exception:
+        texts = []
+        for k in inked:
+            try:
+                texts.append(ocr_quarter(images[k], blank_threshold=0))
+            except Exception as e:
+                texts.append(e)
+    
+    for k, text in zip(inked, texts):
+        results[k] = text
+    return results
+
+class BatchedQuarterResult:
+    """Future-like view of one quarter's text within a batched tesseract run"""
+    
+    def __init__(self, future, index):
+        self.future = future
+        self.index = index
+    
+    def result(self):
+        text = self.future.result()[self.index]
+        if isinstance(text, Exception):
+            raise text
+        return text
+
+def submit_page_quarters_batched(executor, images, page_quarters, blank_threshold=BLANK_INK_RATIO, batches=1,
+                                 batch_fn=ocr_quarter_batch):
+    """Queue the wanted quarters of a window as a few batched tesseract runs
+    
+    The quarters are spread over `batches` runs so the executor can still use
+    several cores. batch_fn(images, blank_threshold) OCRs one run. Returns the
+    same shape as submit_page_quarters.
+    """
+    pending = []
+    queued = []  # (page entry, quarter_idx, quarter image)
+    for image, wanted in zip(images, page_quarters):
+        try:
+            quarters = split_image_into_quarters(image)
+            entry = {}
+            queued.extend((entry, j, quarters[j]) for j in wanted)
+            pending.append(entry)
+        except Exception as e:
+            pending.append(e)
+    
+    batch_size = max(1, -(-len(queued) // max(batches, 1)))
+    for start in range(0, len(queued), batch_size):
+        chunk = queued[start:start + batch_size]
+        future = executor.submit(with_current_handlers(batch_fn), [quarter for _, _, quarter in chunk], blank_threshold)
+        for k, (entry, j, _) in enumerate(chunk):
+            entry[j] = BatchedQuarterResult(future, k)
+    return pending
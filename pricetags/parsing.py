@@ -0,0 +1,81 @@
+"""Parsing of OCR / text-layer text into tag dicts"""
+import re
+
+HEARTH_MARKER = 'Hearth >'
+MODEL_MARKER = 'Model #:'
+# Lines containing any of these are never part of the product name
+PRODUCT_NAME_EXCLUSIONS = ('Hearth >', 'Contracts Available', 'Fireplace Distributors', 'Regular Price:')
+REQUIRED_FIELDS = ('sku', 'productName', 'price')
+
+# One scan decides whether a product-name candidate line is excluded
+_EXCLUDED_NAME_RE = re.compile('|'.join(re.escape(m) for m in PRODUCT_NAME_EXCLUSIONS))
+
+def is_price_line(line):
+    """A standalone price line: starts with '$' and contains a digit (line must be stripped)"""
+    return line.startswith('$') and any(c.isdigit() for c in line)
+
+def make_barcode(sku):
+    """Barcodes are the alphanumeric characters of the SKU"""
+    return ''.join(filter(str.isalnum, sku))
+
+def parse_single_tag(text, log=None):
+    """Parse text from a single tag in one pass over its lines
+    
+    The first 'Hearth >' line is the description, the first 'Model #:' line
+    the SKU and the first '$' line with a digit the price; the product name is
+    made of the remaining lines between the model and price lines. Missing
+    fields are set to "" and listed in '_missing_fields'. Returns None (after
+    logging through `log`) when the text has no SKU, name or price at all.
+    """
+    lines = text.split('\n')
+    description = sku = price = None
+    name_lines = []
+    in_name = False  # Between the model line and the price line
+    
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        price_line = price is None and stripped[0] == '$' and any(c.isdigit() for c in stripped)
+        
+        if in_name and stripped[0] != '$' and not _EXCLUDED_NAME_RE.search(stripped):
+            name_lines.append(stripped)
+        
+        if description is None and HEARTH_MARKER in line:
+            description = stripped
+        if sku is None and MODEL_MARKER in line:
+            sku = line.replace(MODEL_MARKER, '').strip()
+            in_name = price is None
+        
+        if price_line:
+            price = stripped.replace('$', '').strip()
+            in_name = False
+    
+    tag = {}
+    if description is not None:
+        tag['description'] = description
+    if sku is not None:
+        tag['sku'] = sku
+        tag['barcode'] = make_barcode(sku)
+    if price is not None:
+        tag['price'] = price
+    if sku is not None and price is not None and name_lines:
+        # Join all product lines, replacing multiple spaces with single space
+        tag['productName'] = ' '.join(' '.join(name_lines).split())
+    
+    # Ensure all required fields are present, if not, mark them
+    missing_fields = []
+    for field in ('sku', 'productName', 'price', 'barcode'):
+        if not tag.get(field):
+            tag[field] = ""
+            if field in REQUIRED_FIELDS: # Barcode is derived, so don't mark it as user-missing
+                missing_fields.append(field)
+    
+    if not tag['productName'] and not tag['sku'] and not tag['price']:
+        # If all key identifiable fields are missing, it's likely not a valid tag segment
+        if log is not None:
+            log(f"Skipping segment due to multiple missing core fields: {lines}")
+        return None
+    
+    tag['_missing_fields'] = missing_fields
+    return tag
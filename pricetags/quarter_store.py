@@ -0,0 +1,152 @@
+"""OCR results per rasterized quarter, keyed by a hash of its pixels and shared by every session on the server"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from pricetags.ocr import TESSERACT_CONFIG, is_blank_region
+
+QUARTER_STORE_VERSION = 1  # Bump when OCR or parsing changes so stored results are not reused
+QUARTER_STORE_PATH = os.path.join(tempfile.gettempdir(), 'tagger_quarter_store.sqlite3')
+QUARTER_STORE_MAX_BYTES = 512 * 1024 * 1024
+QUARTER_STORE_EVICT_EVERY = 100  # Check the store size after this many writes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quarters (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    tag TEXT,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quarters_used ON quarters (used);
+"""
+
+class QuarterOcrStore:
+    """SQLite-backed map from quarter image hash to (tesseract text, parsed tag); safe to share between threads"""
+
+    def __init__(self, path=QUARTER_STORE_PATH, max_bytes=QUARTER_STORE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    @staticmethod
+    def quarter_key(image):
+        """Hash of a quarter's pixels together with everything else that shapes its OCR text"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{QUARTER_STORE_VERSION}|{TESSERACT_CONFIG}|{image.mode}|{image.size}".encode('utf-8'))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def reusing(self, ocr_fn):
+        """Wrap ocr_fn(image, blank_threshold) to look the quarter up first; the wrapper returns (key, stored, text)
+
+        stored is the (text, tag) of a quarter seen before, in which case
+        ocr_fn is not called and text is None. A blank quarter is neither
+        hashed nor looked up and comes back as (None, None, None).
+        """
+        def run(image, blank_threshold):
+            if blank_threshold and is_blank_region(image, blank_threshold):
+                return None, None, None
+            key = self.quarter_key(image)
+            stored = self.get(key)
+            if stored is not None:
+                return key, stored, None
+            # Already known not to be blank, so ocr_fn need not measure the ink again
+            return key, None, ocr_fn(image, None)
+        return run
+
+    def reusing_batch(self, batch_fn):
+        """Like reusing() for batch_fn(images, blank_threshold); only the quarters not in the store are OCRed"""
+        def run(images, blank_threshold):
+            results = [(None, None, None)] * len(images)
+            keys = {}
+            for k, image in enumerate(images):
+                if not (blank_threshold and is_blank_region(image, blank_threshold)):
+                    keys[k] = self.quarter_key(image)
+                    results[k] = (keys[k], self.get(keys[k]), None)
+            missing = [k for k in keys if results[k][1] is None]
+            if missing:
+                texts = batch_fn([images[k] for k in missing], None)
+                for k, text in zip(missing, texts):
+                    results[k] = text if isinstance(text, Exception) else (keys[k], None, text)
+            return results
+        return run
+
+    def get(self, key):
+        """(text, tag) stored for the key, or None; tag is a fresh dict or None when the text did not parse"""
+        try:
+            with self._connect() as db:
+                row = db.execute('SELECT text, tag FROM quarters WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    db.execute('UPDATE quarters SET used = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.Error:
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        text, tag = row
+        return text, (json.loads(tag) if tag is not None else None)
+
+    def put(self, key, text, tag):
+        """Remember a quarter's OCR text and parsed tag (None if it gave no tag)"""
+        tag_json = json.dumps(tag) if tag is not None else None
+        size = len(key) + len(text.encode('utf-8')) + len(tag_json or '')
+        try:
+            with self._connect() as db:
+                db.execute('INSERT OR REPLACE INTO quarters (key, text, tag, size, used) VALUES (?, ?, ?, ?, ?)',
+                           (key, text, tag_json, size, time.time()))
+        except sqlite3.Error:
+            return
+        with self._lock:
+            self._writes += 1
+            check = self._writes % QUARTER_STORE_EVICT_EVERY == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used quarters until the stored results fit in max_bytes"""
+        try:
+            with self._connect() as db:
+                total = db.execute('SELECT COALESCE(SUM(size), 0) FROM quarters').fetchone()[0]
+                excess = total - self.max_bytes
+                if excess <= 0:
+                    return
+                doomed = []
+                for key, size in db.execute('SELECT key, size FROM quarters ORDER BY used'):
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= size
+                db.executemany('DELETE FROM quarters WHERE key = ?', doomed)
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """Hit and miss counts of this process, and the number and size of stored quarters"""
+        try:
+            entries, size = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM quarters').fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
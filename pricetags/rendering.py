@@ -0,0 +1,337 @@
+"""PDF rendering of price tags, importable by worker processes"""
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import types
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from pricetags.barcodes import BARCODE_SYMBOLOGIES, DEFAULT_BARCODE_TYPE, barcode_box, draw_barcode
+from pricetags.imposition import CROP_MARKS_FORM, DEFAULT_TAG_SIZE, define_crop_marks, impose
+from pricetags.layout import fit_text, text_width
+from pricetags.reporting import add_to_debug_log, timed
+
+TAG_CHROME_FORM = 'tag_chrome'
+DEFAULT_RENDER_WORKERS = os.cpu_count() or 1
+PDF_OUTPUT_NAME = 'price_tags_final'
+MIN_SHARD_PAGES = 50  # Smaller print runs are not worth starting worker processes for
+# The tag design is laid out for a 4x1.5" tag; other stock sizes scale it by height
+REFERENCE_TAG_HEIGHT = 1.5 * inch
+NAME_WIDTH_RATIO = 0.9  # Share of the tag width the product name is fitted into
+FONT_FAMILIES = {  # Base font -> (bold, oblique) faces used on the tag
+    'Helvetica': ('Helvetica-Bold', 'Helvetica-Oblique'),
+    'Times-Roman': ('Times-Bold', 'Times-Italic'),
+    'Courier': ('Courier-Bold', 'Courier-Oblique'),
+}
+
+# font_size: largest product name size; price_size: price font size (both for a 1.5" tall tag);
+# sheet_margin: inches between the sheet edge and the tag grid (Tags.json 'margin'); tag_size: 'WxH' in inches; crop_marks: draw them;
+# barcode_type: symbology of the barcode drawn from the tag's barcode field, None for no barcode
+TagSettings = namedtuple('TagSettings', 'font_name font_size price_size sheet_margin tag_size crop_marks barcode_type',
+                         defaults=(DEFAULT_TAG_SIZE, False, DEFAULT_BARCODE_TYPE))
+DEFAULT_TAG_SETTINGS = TagSettings(font_name='Helvetica', font_size=12, price_size=14, sheet_margin=0.25)
+
+def tag_settings_from_json(settings, default=DEFAULT_TAG_SETTINGS, tag_size=None):
+    """TagSettings from a Tags.json 'settings' block (fontName, fontSize, priceSize, margin, cropMarks,
+    barcodeType) and its 'tagSize', keeping defaults for the rest; 'margin' is the sheet margin in inches"""
+    settings = settings or {}
+    font_name = settings.get('fontName', default.font_name)
+    if font_name not in FONT_FAMILIES:
+        add_to_debug_log(f"Unsupported font {font_name!r} in tag settings, using {default.font_name}")
+        font_name = default.font_name
+    barcode_type = settings.get('barcodeType', default.barcode_type)
+    if not barcode_type or str(barcode_type).lower() == 'none':
+        barcode_type = None
+    elif barcode_type not in BARCODE_SYMBOLOGIES:
+        add_to_debug_log(f"Unsupported barcode type {barcode_type!r} in tag settings, using {default.barcode_type}")
+        barcode_type = default.barcode_type
+    tag_settings = TagSettings(
+        font_name=font_name,
+        font_size=float(settings.get('fontSize', default.font_size)),
+        price_size=float(settings.get('priceSize', default.price_size)),
+        sheet_margin=float(settings.get('margin', default.sheet_margin)),
+        tag_size=tag_size or default.tag_size,
+        crop_marks=bool(settings.get('cropMarks', default.crop_marks)),
+        barcode_type=barcode_type,
+    )
+    try:
+        imposition_for(tag_settings)
+    except ValueError as e:
+        add_to_debug_log(f"{e}; using {default.tag_size} tags with a {default.sheet_margin} inch sheet margin")
+        tag_settings = tag_settings._replace(tag_size=default.tag_size, sheet_margin=default.sheet_margin)
+    return tag_settings
+
+def imposition_for(settings):
+    """The sheet layout (see imposition.impose) of tags rendered with settings"""
+    return impose(settings.tag_size, settings.sheet_margin * inch)
+
+def auto_split_text(text, max_width, c, initial_font_size=12):
+    """Automatically split and size text to fit within max_width (see layout.fit_text)"""
+    layout = fit_text(text, max_width, 'Helvetica-Bold', initial_font_size)
+    return list(layout.lines), layout.font_size
+
+def define_tag_chrome(c, tag_width, tag_height):
+    """Draw the static tag background (blue bar and border) once as a reusable form XObject
+    
+    The form is drawn in tag coordinates, with the origin at the tag's bottom
+    left corner, and stamped onto every tag with c.doForm(TAG_CHROME_FORM).
+    """
+    c.beginForm(TAG_CHROME_FORM, 0, 0, tag_width, tag_height)
+    
+    # Blue bar at bottom of tag
+    scale = tag_height / REFERENCE_TAG_HEIGHT
+    c.setFillColorRGB(0, 0.3, 0.8)  # Dark blue
+    c.rect(0, 0.1*inch*scale, tag_width, 0.2*inch*scale, fill=1)
+    c.setFillColorRGB(0, 0, 0)  # Back to black
+    
+    # Tag border
+    c.setLineWidth(1)
+    c.rect(0, 0, tag_width, tag_height)
+    
+    c.endForm()
+
+def stamp_tag_chrome(c, x, y):
+    """Place the tag background form with its bottom left corner at (x, y)"""
+    c.saveState()
+    c.translate(x, y)
+    c.doForm(TAG_CHROME_FORM)
+    c.restoreState()
+
+def fitted_size(text, font_name, font_size, max_width):
+    """font_size, reduced if needed so text is no wider than max_width"""
+    width = text_width(text, font_name, font_size)
+    return font_size * max_width / width if width > max_width else font_size
+
+def draw_tag(c, tag, x, y, tag_width, tag_height, settings, fonts, barcode_forms):
+    """Draw one tag's background, text and barcode with its bottom left corner at (x, y)
+
+    Returns False if the tag should have had a barcode that could not be drawn.
+    """
+    bold_font, oblique_font = fonts
+    scale = tag_height / REFERENCE_TAG_HEIGHT
+    name_width = tag_width * NAME_WIDTH_RATIO
+    top = y + tag_height
+    # With a barcode on the right, the model number and price are centered in the left half
+    info_width = tag_width / 2 if settings.barcode_type else tag_width
+    info_text_width = info_width * NAME_WIDTH_RATIO
+    
+    # Stamp the shared background (blue bar and border)
+    stamp_tag_chrome(c, x, y)
+    
+    # Auto-split and size product name
+    layout = fit_text(tag['productName'], name_width, bold_font, settings.font_size * scale)
+    lines, font_size, widths = layout.lines, layout.font_size, layout.widths
+    # fit_text lets lines run past name_width; shrink those so they stay on this tag and off its neighbours
+    widest = max(widths, default=0)
+    if widest > name_width:
+        font_size *= name_width / widest
+        widths = [width * name_width / widest for width in widths]
+    
+    # Draw product name
+    c.setFont(bold_font, font_size)
+    
+    # Calculate vertical spacing based on number of lines
+    if len(lines) == 1:
+        start_y = top - 0.45*inch*scale
+        line_spacing = 0
+    else:
+        start_y = top - 0.35*inch*scale  # Start higher for two lines
+        line_spacing = 0.15*inch*scale
+    
+    # Draw each line centered, using the widths measured while fitting
+    for line_idx, (line, line_width) in enumerate(zip(lines, widths)):
+        c.drawString(x + (tag_width - line_width) / 2, start_y - (line_idx * line_spacing), line)
+    
+    # Draw model number in italics, centered
+    model_text = f"Model: {tag['sku']}"
+    model_size = fitted_size(model_text, oblique_font, 10 * scale, info_text_width)
+    c.setFont(oblique_font, model_size)
+    c.drawString(x + (info_width - text_width(model_text, oblique_font, model_size)) / 2, top - 0.8*inch*scale, model_text)
+    
+    # Draw price (large and bold), centered
+    # Ensure price is properly formatted
+    price = tag['price'].strip().replace('$', '')
+    price_text = f"Price: ${price}"
+    price_size = fitted_size(price_text, bold_font, settings.price_size * scale, info_text_width)
+    c.setFont(bold_font, price_size)
+    c.drawString(x + (info_width - text_width(price_text, bold_font, price_size)) / 2, top - 1.1*inch*scale, price_text)
+    
+    if not settings.barcode_type:
+        return True
+    box_x, box_y, box_width, box_height = barcode_box(tag_width, tag_height)
+    return draw_barcode(c, tag.get('barcode', ''), settings.barcode_type, x + box_x, y + box_y, box_width, box_height,
+                        barcode_forms)
+
+def render_tag_pdf(output, tags_to_print, settings=DEFAULT_TAG_SETTINGS):
+    """Render tags onto a new canvas, imposed in a grid per settings, and save it to output (a file path or binary file object)"""
+    imposition = imposition_for(settings)
+    fonts = FONT_FAMILIES[settings.font_name]
+    per_page = imposition.per_page
+    
+    c = canvas.Canvas(output, pagesize=(imposition.page_width, imposition.page_height))
+    define_tag_chrome(c, imposition.tag_width, imposition.tag_height)
+    crop_marks = settings.crop_marks and define_crop_marks(c, imposition)
+    barcode_forms = {}  # Barcode value -> its form, so repeated SKUs are drawn once per document
+    missing_barcodes = 0
+    
+    # Fill each sheet row by row
+    for i in range(0, len(tags_to_print), per_page):
+        if crop_marks:
+            c.doForm(CROP_MARKS_FORM)
+        for slot, tag in enumerate(tags_to_print[i:i + per_page]):
+            x, y = imposition.slot_origin(slot)
+            if not draw_tag(c, tag, x, y, imposition.tag_width, imposition.tag_height, settings, fonts, barcode_forms):
+                missing_barcodes += 1
+        
+        # Start new page if we have more tags
+        if i + per_page < len(tags_to_print):
+            c.showPage()
+            c.setFont('Helvetica', 12)
+    
+    c.save()
+    if missing_barcodes:
+        add_to_debug_log(f"{missing_barcodes} tag(s) printed without a barcode: empty, not encodable as "
+                         f"{settings.barcode_type} or too long for a {settings.tag_size} tag")
+
+def shard_tags(tags_to_print, shard_count, min_shard_pages=MIN_SHARD_PAGES, per_page=None):
+    """Split tags into at most shard_count page-aligned slices of at least min_shard_pages pages of per_page tags"""
+    per_page = per_page or imposition_for(DEFAULT_TAG_SETTINGS).per_page
+    pages = -(-len(tags_to_print) // per_page)
+    shard_count = max(1, min(shard_count, pages // max(min_shard_pages, 1)))
+    shard_pages = -(-pages // shard_count)
+    shard_size = shard_pages * per_page
+    return [tags_to_print[i:i + shard_size] for i in range(0, len(tags_to_print), shard_size)]
+
+def _render_job(job):
+    path, tags, settings = job
+    render_tag_pdf(path, tags, settings)
+    return path
+
+_main_swap_lock = threading.Lock()
+
+@contextmanager
+def _hidden_main():
+    """Start spawned workers without the calling script as their __main__
+    
+    spawn re-imports the parent's __main__ script in every worker; for the
+    Streamlit app that runs the whole app outside a session and kills the
+    worker. The workers only need pricetags, so an empty __main__ is
+    swapped in while they are started.
+    """
+    with _main_swap_lock:
+        main = sys.modules.get('__main__')
+        sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = main
+
+def render_tag_pdfs(jobs, workers=1):
+    """Render (path, tags, settings) jobs, spread over `workers` processes when there is more than one job
+    
+    Workers are spawned rather than forked so they never inherit the threads of
+    the calling process (the Streamlit server, OCR pools). If the worker pool
+    breaks the jobs are rendered in this process instead. Returns the paths in
+    job order.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            # Submitting starts the workers, so that is when __main__ has to be hidden
+            with _hidden_main():
+                futures = [executor.submit(_render_job, job) for job in jobs]
+            return [future.result() for future in futures]
+    except BrokenProcessPool as e:
+        add_to_debug_log(f"Render workers failed ({e}), rendering {len(jobs)} job(s) in one process")
+        return [_render_job(job) for job in jobs]
+
+def merge_pdf_files(paths, output_path):
+    """Concatenate PDF files, in order, into output_path"""
+    writer = PdfWriter()
+    for path in paths:
+        for page in PdfReader(path).pages:
+            writer.add_page(page)
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    return output_path
+
+def render_tag_pdf_parallel(output_path, tags_to_print, workers, min_shard_pages=MIN_SHARD_PAGES,
+                            settings=DEFAULT_TAG_SETTINGS):
+    """Render one PDF by rendering page-aligned shards in parallel and merging them
+    
+    Shard files are written next to output_path and removed after the merge.
+    Falls back to a single in-process render when there is only one shard.
+    """
+    shards = shard_tags(tags_to_print, workers, min_shard_pages, imposition_for(settings).per_page)
+    if len(shards) == 1:
+        render_tag_pdf(output_path, tags_to_print, settings)
+        return output_path
+    
+    base, _ = os.path.splitext(output_path)
+    jobs = [(f"{base}.shard{n:03d}.pdf", shard, settings) for n, shard in enumerate(shards)]
+    shard_paths = render_tag_pdfs(jobs, workers)
+    try:
+        return merge_pdf_files(shard_paths, output_path)
+    finally:
+        for path in shard_paths:
+            os.remove(path)
+
+def generate_pdf(tags_to_print, settings=DEFAULT_TAG_SETTINGS):
+    if not tags_to_print:
+        add_to_debug_log("generate_pdf called with no tags to print.")
+        return None # Or handle as an empty PDF if preferred
+    
+    buffer = io.BytesIO()
+    render_tag_pdf(buffer, tags_to_print, settings)
+    buffer.seek(0)
+    return buffer
+
+def write_tag_pdfs(tags_to_print, out_dir, pages_per_file=0, base_name=PDF_OUTPUT_NAME, workers=1,
+                   settings=DEFAULT_TAG_SETTINGS):
+    """Render tags straight to PDF files in out_dir, starting a new file every pages_per_file pages
+    
+    Only one file's canvas is alive at a time per worker and nothing is collected
+    in memory, so with splitting enabled memory use is bounded by pages_per_file
+    whatever the tag count. pages_per_file=0 writes a single file. With workers > 1
+    split files are rendered in parallel, and a single large file is rendered as
+    page-aligned shards that are merged in order. settings (a TagSettings)
+    sets the fonts, tag size, sheet margin and crop marks. Returns the paths in order.
+    """
+    if not tags_to_print:
+        add_to_debug_log("write_tag_pdfs called with no tags to print.")
+        return []
+    
+    per_page = imposition_for(settings).per_page
+    tags_per_file = pages_per_file * per_page if pages_per_file else len(tags_to_print)
+    split = tags_per_file < len(tags_to_print)
+    with timed('render', count=-(-len(tags_to_print) // per_page)):
+        if split:
+            jobs = [(os.path.join(out_dir, f"{base_name}_part{part:03d}.pdf"), tags_to_print[start:start + tags_per_file],
+                     settings)
+                    for part, start in enumerate(range(0, len(tags_to_print), tags_per_file), start=1)]
+            paths = render_tag_pdfs(jobs, workers)
+        else:
+            paths = [render_tag_pdf_parallel(os.path.join(out_dir, f"{base_name}.pdf"), tags_to_print, workers,
+                                             settings=settings)]
+    add_to_debug_log(f"Wrote {len(tags_to_print)} tags to {len(paths)} PDF file(s) in {out_dir}")
+    return paths
+
+def bundle_pdf_files(paths, zip_path):
+    """Pack split PDF files into one ZIP for download, copying them from disk one at a time"""
+    # PDF content streams are already compressed, so store rather than deflate
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zf:
+        for path in paths:
+            zf.write(path, os.path.basename(path))
+    return zip_path
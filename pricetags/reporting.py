@@ -0,0 +1,178 @@
+"""Where the core's debug events and user notices go, by handlers installed per thread"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Debug events are dicts: {'kind': 'log', 'message': ...} for log lines, and {'kind': 'timing', 'stage': ...,
+# 'seconds': ..., 'count': ...} plus 'page' / 'quarter' where they apply for stage timings, 'count' being the
+# number of pages, quarters or tags the timing covers
+STAGES = ('rasterize', 'ocr', 'parse', 'validate', 'render', 'extract', 'import', 'reprice')
+DEBUG_LOG_CAPACITY = 2000  # Events an EventLog keeps in memory
+DEBUG_LOG_MAX_BYTES = 32 * 1024 * 1024  # Size at which an app session's JSONL log file is rotated to <path>.1
+TIMING_SAMPLES = 5000  # Most recent timings per stage kept for the percentiles
+
+_handlers = threading.local()
+
+def _print_notice(level, message):
+    print(f"{level.upper()}: {message}", file=sys.stderr)
+
+def set_handlers(log=None, notify=None):
+    """Route this thread's debug events to log(event) and notices to notify(level, message)"""
+    _handlers.log = log
+    _handlers.notify = notify
+
+def with_current_handlers(fn):
+    """Wrap fn so that, run on a worker thread, it reports to the calling thread's handlers"""
+    log, notify = getattr(_handlers, 'log', None), getattr(_handlers, 'notify', None)
+
+    def run(*args, **kwargs):
+        previous = getattr(_handlers, 'log', None), getattr(_handlers, 'notify', None)
+        set_handlers(log, notify)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            set_handlers(*previous)
+    return run
+
+def log_event(event):
+    log = getattr(_handlers, 'log', None)
+    if log is not None:
+        event.setdefault('time', time.time())
+        log(event)
+
+def add_to_debug_log(message, **fields):
+    """Add a message to the debug log of whoever is running the current thread"""
+    log_event(dict(fields, kind='log', message=message))
+
+def record_timing(stage, seconds, count=1, **where):
+    """Record that `stage` took `seconds` for `count` pages, quarters or tags (where: page=, quarter=)"""
+    where = {key: value for key, value in where.items() if value is not None}
+    log_event(dict(where, kind='timing', stage=stage, seconds=round(seconds, 6), count=count))
+
+@contextmanager
+def timed(stage, count=1, **where):
+    """Record the time spent in the with-block as a timing of `stage`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(stage, time.perf_counter() - start, count, **where)
+
+def notify_user(level, message):
+    """Show an 'error' or 'warning' to whoever is running the current thread"""
+    notify = getattr(_handlers, 'notify', None) or _print_notice
+    notify(level, message)
+
+def format_event(event):
+    """One readable line (or block, for multi-line messages) for a debug event"""
+    if event.get('kind') == 'timing':
+        where = ' '.join(f"{key} {event[key]}" for key in ('page', 'quarter') if key in event)
+        return f"[{event['stage']}{' ' + where if where else ''}] {event['seconds'] * 1000:.1f} ms for {event['count']}"
+    return event.get('message', '')
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+class EventLog:
+    """Thread-safe ring buffer of debug events, with per-stage timing statistics
+
+    Only the last `capacity` events stay in memory. With a path, every event
+    is also appended to that file as a JSON line, so the full log can still be
+    downloaded however long the session runs. With max_bytes the file is
+    moved to <path>.1 (replacing the one before) and started over when it
+    would grow past that size, so at least the last max_bytes stay on disk.
+    """
+
+    def __init__(self, capacity=DEBUG_LOG_CAPACITY, path=None, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.total = 0  # Events ever added; the sequence number of the next one
+        self._events = deque(maxlen=capacity)
+        self._samples = {stage: deque(maxlen=TIMING_SAMPLES) for stage in STAGES}
+        self._totals = {stage: [0, 0.0] for stage in STAGES}  # stage -> [count, seconds] over the whole log
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._file_bytes = self._file.tell() if self._file is not None else 0
+        self.rotations = 0  # Times the file was rotated; after the second, the oldest events are gone
+        self._lock = threading.Lock()
+
+    def add(self, event):
+        event.setdefault('time', time.time())
+        with self._lock:
+            self._events.append(event)
+            self.total += 1
+            stage = event.get('stage')
+            if event.get('kind') == 'timing' and stage in self._samples:
+                count = event.get('count') or 1
+                self._samples[stage].append(event['seconds'] / count)
+                self._totals[stage][0] += count
+                self._totals[stage][1] += event['seconds']
+            if self._file is not None:
+                line = json.dumps(event) + '\n'
+                if self.max_bytes and self._file_bytes + len(line) > self.max_bytes:
+                    # Start a new file rather than let a long session fill the disk
+                    self._file.close()
+                    os.replace(self.path, self.path + '.1')
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                    self._file_bytes = 0
+                    self.rotations += 1
+                self._file.write(line)
+                self._file_bytes += len(line)
+
+    def log(self, message, **fields):
+        self.add(dict(fields, kind='log', message=message))
+
+    def extend(self, events):
+        for event in events:
+            self.add(event)
+
+    def since(self, start):
+        """Events numbered `start` onwards that are still in memory, and the number to ask for next time"""
+        with self._lock:
+            missed = max(0, self.total - start - len(self._events))
+            skip = max(0, len(self._events) - (self.total - start))
+            events = [event for k, event in enumerate(self._events) if k >= skip]
+            if missed:
+                events.insert(0, {'kind': 'log', 'message': f"({missed} debug events dropped)", 'time': time.time()})
+            return events, self.total
+
+    def recent(self, count):
+        with self._lock:
+            return list(self._events)[-count:]
+
+    def summary(self):
+        """Per-stage timing rows (per page, quarter or tag) and the overall extraction pages/sec"""
+        rows = []
+        with self._lock:
+            for stage in STAGES:
+                samples = sorted(self._samples[stage])
+                if not samples:
+                    continue
+                count, seconds = self._totals[stage]
+                rows.append({
+                    'stage': stage,
+                    'count': count,
+                    'p50_ms': round(_percentile(samples, 0.5) * 1000, 2),
+                    'p95_ms': round(_percentile(samples, 0.95) * 1000, 2),
+                    'total_s': round(seconds, 3),
+                })
+            pages, seconds = self._totals['extract']
+        return rows, (pages / seconds if seconds else None)
+
+    def read_jsonl(self):
+        """The JSONL log on disk for a download, the rotated <path>.1 first; needs a path
+
+        Returns the bytes and whether older events were already rotated out of it.
+        """
+        with self._lock:
+            # Under the lock, so the file cannot be rotated between the two reads
+            self._file.flush()
+            parts = []
+            for path in (self.path + '.1', self.path):
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        parts.append(f.read())
+            return b''.join(parts), self.rotations > 1
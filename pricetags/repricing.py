@@ -0,0 +1,70 @@
+"""Delta repricing: apply a price feed to the current tags by SKU or barcode"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from pricetags.importing import iter_tag_rows, normalize_row
+from pricetags.reporting import add_to_debug_log, timed
+from pricetags.store import TagStore
+from pricetags.validation import refresh_missing_fields
+
+# changed: [(tag index, old price, new price)]; added: feed rows matching no tag;
+# removed: indices of tags the feed does not list; unchanged: matched tags whose price stays
+PriceDelta = namedtuple('PriceDelta', 'changed added removed unchanged')
+
+def load_price_feed(f, fmt):
+    """Normalized rows of a price feed file (opened as text) that carry a SKU or barcode"""
+    feed = []
+    for row in iter_tag_rows(f, fmt):
+        row = normalize_row(row)
+        if row['sku'] or row['barcode']:
+            feed.append(row)
+    return feed
+
+def same_price(a, b):
+    """Whether two price strings are the same amount ('19.9' and '19.90' are)"""
+    try:
+        return Decimal(a.replace(',', '')) == Decimal(b.replace(',', ''))
+    except InvalidOperation:
+        return a == b
+
+def diff_prices(tags, feed):
+    """PriceDelta of a price feed against tags (a TagStore); the tags are not modified
+
+    Feed rows without a price only mark their tags as still listed. When
+    several tags share a SKU they all take the feed's price.
+    """
+    if not isinstance(tags, TagStore):
+        raise TypeError("diff_prices needs a TagStore (for its SKU and barcode indexes)")
+    changed = []
+    added = []
+    matched = set()
+    unchanged = 0
+    with timed('reprice', count=len(feed)):
+        for row in feed:
+            indices = tags.lookup('sku', row['sku']) if row['sku'] else []
+            if not indices and row['barcode']:
+                indices = tags.lookup('barcode', row['barcode'])
+            if not indices:
+                added.append(row)
+                continue
+            for idx in indices:
+                if idx in matched:
+                    continue  # A repeated feed row: the first one wins
+                matched.add(idx)
+                old_price = tags.get_value(idx, 'price')
+                if row['price'] and not same_price(old_price, row['price']):
+                    changed.append((idx, old_price, row['price']))
+                else:
+                    unchanged += 1
+        removed = [idx for idx in range(len(tags)) if idx not in matched]
+    add_to_debug_log(f"Price feed of {len(feed)} items: {len(changed)} changed, {len(added)} added, "
+                     f"{len(removed)} not listed, {unchanged} unchanged")
+    return PriceDelta(changed, added, removed, unchanged)
+
+def apply_price_delta(tags, delta):
+    """Write the delta's new prices into tags and return the indices of the changed tags"""
+    for idx, _, new_price in delta.changed:
+        tag = tags[idx]
+        tag['price'] = new_price
+        refresh_missing_fields(tag)  # A tag that had no price may be complete now
+    return [idx for idx, _, _ in delta.changed]
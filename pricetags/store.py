@@ -0,0 +1,284 @@
+"""Compact columnar storage for the tags of an editing session, with dict-like records"""
+import sys
+from array import array
+from bisect import bisect_left, insort
+
+TAG_FIELDS = ('productName', 'sku', 'price', 'barcode', 'description')
+SHARED_FIELDS = ('productName', 'price', 'description')
+INDEXED_FIELDS = ('sku', 'barcode')
+
+# For every byte value, the positions of its set bits
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+class Bitset:
+    """Fixed-order set of tag indices, one bit per tag"""
+
+    __slots__ = ('_bytes', 'size')
+
+    def __init__(self, size=0):
+        self._bytes = bytearray((size + 7) // 8)
+        self.size = size
+
+    def __getitem__(self, idx):
+        return bool(self._bytes[idx >> 3] >> (idx & 7) & 1)
+
+    def __setitem__(self, idx, value):
+        if value:
+            self._bytes[idx >> 3] |= 1 << (idx & 7)
+        else:
+            self._bytes[idx >> 3] &= ~(1 << (idx & 7)) & 0xFF
+
+    def append(self, value):
+        if self.size % 8 == 0:
+            self._bytes.append(0)
+        self.size += 1
+        if value:
+            self[self.size - 1] = True
+
+    def set_all(self, value):
+        self._bytes[:] = bytes([0xFF if value else 0]) * len(self._bytes)
+        if value and self.size % 8:
+            self._bytes[-1] = (1 << (self.size % 8)) - 1  # Bits past the end stay clear
+
+    def delete(self, removed):
+        """Drop the bits at the (sorted, unique) removed indices, shifting the rest down"""
+        kept = [self[idx] for idx in range(self.size) if not _contains(removed, idx)]
+        self.__init__(len(kept))
+        for idx, value in enumerate(kept):
+            if value:
+                self[idx] = True
+
+    def as_int(self):
+        return int.from_bytes(self._bytes, 'little')
+
+    def count(self):
+        return self.as_int().bit_count()
+
+    def indices(self):
+        return bit_indices(self._bytes)
+
+def _contains(sorted_values, value):
+    pos = bisect_left(sorted_values, value)
+    return pos < len(sorted_values) and sorted_values[pos] == value
+
+def bit_indices(data):
+    """Yield the positions of the set bits of a little-endian bytes object or int"""
+    if isinstance(data, int):
+        data = data.to_bytes((data.bit_length() + 7) // 8, 'little')
+    for byte_idx, value in enumerate(data):
+        if value:
+            base = byte_idx << 3
+            for bit in _BYTE_BITS[value]:
+                yield base + bit
+
+class TagRecord:
+    """Dict-like view of one tag in a TagStore; positional, so fetch it again after tags are deleted"""
+
+    __slots__ = ('_store', '_idx')
+
+    def __init__(self, store, idx):
+        self._store = store
+        self._idx = idx
+
+    def __getitem__(self, key):
+        return self._store.get_value(self._idx, key)
+
+    def __setitem__(self, key, value):
+        self._store.set_value(self._idx, key, value)
+
+    def __contains__(self, key):
+        try:
+            self._store.get_value(self._idx, key)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self._store.get_value(self._idx, key)
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self._store.to_dict(self._idx).keys()
+
+    def to_dict(self):
+        return self._store.to_dict(self._idx)
+
+    def __repr__(self):
+        return f"TagRecord({self._idx}, {self.to_dict()!r})"
+
+class TagStore:
+    """Columnar list of tags with bitset flags and lookup indexes on SKU and barcode"""
+
+    def __init__(self, tags=()):
+        self._columns = {field: [] for field in TAG_FIELDS}
+        self.selected = Bitset()
+        self.incomplete = Bitset()  # Tags with a non-empty '_missing_fields'
+        self._missing = array('H')  # Per tag: code of its '_missing_fields' in _missing_sets
+        self._missing_sets = [()]
+        self._missing_codes = {(): 0}
+        self._confidence = {}  # Sparse: tag index -> per-field OCR confidence (zone OCR only)
+        self._extra = {}  # Sparse: tag index -> any other keys
+        self._indexes = {}  # field -> {value: [tag index, ...]}, built on first lookup
+        self.extend(tags)
+
+    def __len__(self):
+        return len(self._missing)
+
+    def __bool__(self):
+        return len(self._missing) > 0
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return TagRecord(self, idx)
+
+    def __iter__(self):
+        return (TagRecord(self, idx) for idx in range(len(self)))
+
+    def _missing_code(self, fields):
+        fields = tuple(fields or ())
+        code = self._missing_codes.get(fields)
+        if code is None:
+            code = self._missing_codes[fields] = len(self._missing_sets)
+            self._missing_sets.append(fields)
+        return code
+
+    @staticmethod
+    def _value(field, value):
+        # Names and prices repeat across a catalogue, so equal ones share one string
+        return sys.intern(value) if field in SHARED_FIELDS and isinstance(value, str) else value
+
+    def append(self, tag):
+        """Add a tag dict (or record); the store keeps its own copy of the values"""
+        idx = len(self)
+        for field, column in self._columns.items():
+            column.append(self._value(field, tag.get(field) or ''))
+        missing = tag.get('_missing_fields')
+        self._missing.append(self._missing_code(missing))
+        self.selected.append(bool(tag.get('selected_for_print', False)))
+        self.incomplete.append(bool(missing))
+        confidence = tag.get('_confidence')
+        if confidence:
+            self._confidence[idx] = dict(confidence)
+        extra_keys = [key for key in tag.keys() if key not in _KNOWN_KEYS]
+        if extra_keys:
+            self._extra[idx] = {key: tag[key] for key in extra_keys}
+        for field, index in self._indexes.items():
+            index.setdefault(self._columns[field][idx], []).append(idx)
+
+    def extend(self, tags):
+        for tag in tags:
+            self.append(tag)
+
+    def get_value(self, idx, key):
+        column = self._columns.get(key)
+        if column is not None:
+            return column[idx]
+        if key == 'selected_for_print':
+            return self.selected[idx]
+        if key == '_missing_fields':
+            return list(self._missing_sets[self._missing[idx]])
+        if key == '_confidence' and idx in self._confidence:
+            return self._confidence[idx]
+        extra = self._extra.get(idx)
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def set_value(self, idx, key, value):
+        column = self._columns.get(key)
+        if column is not None:
+            value = self._value(key, value or '')
+            index = self._indexes.get(key)
+            if index is not None:
+                index[column[idx]].remove(idx)
+                insort(index.setdefault(value, []), idx)
+            column[idx] = value
+        elif key == 'selected_for_print':
+            self.selected[idx] = value
+        elif key == '_missing_fields':
+            self._missing[idx] = self._missing_code(value)
+            self.incomplete[idx] = bool(value)
+        elif key == '_confidence':
+            self._confidence[idx] = dict(value)
+        else:
+            self._extra.setdefault(idx, {})[key] = value
+
+    def to_dict(self, idx):
+        """Plain dict copy of one tag, in the shape the extraction pipeline produces"""
+        tag = {field: column[idx] for field, column in self._columns.items()}
+        tag['_missing_fields'] = list(self._missing_sets[self._missing[idx]])
+        tag['selected_for_print'] = self.selected[idx]
+        if idx in self._confidence:
+            tag['_confidence'] = dict(self._confidence[idx])
+        tag.update(self._extra.get(idx, {}))
+        return tag
+
+    def to_dicts(self, indices=None):
+        return [self.to_dict(idx) for idx in (range(len(self)) if indices is None else indices)]
+
+    def delete(self, indices):
+        """Remove the tags at the given indices; later tags move down"""
+        removed = sorted(set(indices))
+        if not removed:
+            return
+
+        def shift(sparse):
+            return {idx - bisect_left(removed, idx): value for idx, value in sparse.items() if not _contains(removed, idx)}
+
+        for field, column in self._columns.items():
+            self._columns[field] = [value for idx, value in enumerate(column) if not _contains(removed, idx)]
+        self._missing = array('H', (code for idx, code in enumerate(self._missing) if not _contains(removed, idx)))
+        self.selected.delete(removed)
+        self.incomplete.delete(removed)
+        self._confidence = shift(self._confidence)
+        self._extra = shift(self._extra)
+        self._indexes = {}
+
+    def pop(self, idx):
+        tag = self.to_dict(idx)
+        self.delete([idx])
+        return tag
+
+    def lookup(self, field, value):
+        """Indices of the tags whose field (sku or barcode) equals value, in order"""
+        index = self._indexes.get(field)
+        if index is None:
+            if field not in INDEXED_FIELDS:
+                raise KeyError(f"{field} is not indexed")
+            index = self._indexes[field] = {}
+            for idx, field_value in enumerate(self._columns[field]):
+                index.setdefault(field_value, []).append(idx)
+        return list(index.get(value, ()))
+
+    def confidence_indices(self):
+        """Indices of the tags that carry per-field OCR confidences"""
+        return sorted(self._confidence)
+
+    def set_all_selected(self, selected):
+        self.selected.set_all(selected)
+
+    # Print counters, answered from the bitsets without visiting the tags
+    def selected_count(self):
+        return self.selected.count()
+
+    def incomplete_count(self):
+        return self.incomplete.count()
+
+    def problematic_count(self):
+        """Selected tags that still have missing fields"""
+        return (self.selected.as_int() & self.incomplete.as_int()).bit_count()
+
+    def ready_count(self):
+        return self.selected_count() - self.problematic_count()
+
+    def selected_indices(self, complete):
+        """Indices of the selected tags that are complete (complete=True) or have missing fields"""
+        incomplete = self.incomplete.as_int()
+        return list(bit_indices(self.selected.as_int() & (~incomplete if complete else incomplete)))
+
+_KNOWN_KEYS = frozenset(TAG_FIELDS + ('selected_for_print', '_missing_fields', '_confidence'))
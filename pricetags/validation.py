@@ -0,0 +1,169 @@
+"""Tag validation: required fields, text fit, and an incremental validator for editing sessions"""
+from bisect import bisect_left
+
+from pricetags.barcodes import barcode_box, barcode_issue
+from pricetags.imposition import parse_tag_size
+from pricetags.layout import fit_text, text_width
+from pricetags.rendering import DEFAULT_TAG_SETTINGS, FONT_FAMILIES, NAME_WIDTH_RATIO, REFERENCE_TAG_HEIGHT
+from pricetags.reporting import timed
+
+# Tag field -> the name '_missing_fields' uses for it
+MISSING_FIELD_LABELS = {'productName': 'Product Name', 'sku': 'SKU', 'price': 'Price', 'barcode': 'Barcode'}
+
+def validate_tag_text(text, max_width, font_name='Helvetica-Bold', font_size=12):
+    """Calculate if text will fit within max_width"""
+    # Split text into lines if it contains the separator
+    lines = text.split('|')
+    
+    # Check each line separately
+    for i, line in enumerate(lines):
+        line_width = text_width(line.strip().upper(), font_name, font_size)
+        # First line can be longer than second line
+        max_allowed = max_width * (1.5 if i == 0 else 1.2)
+        if line_width > max_allowed:
+            return False
+    return True
+
+def validate_tags(tags, settings=DEFAULT_TAG_SETTINGS):
+    """Check all tags for potential issues: names too wide, and barcodes that cannot be printed
+    
+    Names and barcodes are measured as they will be rendered with settings
+    (TagSettings: tag size, font and barcode type); there are no barcode
+    issues when settings has no barcode type. Barcodes are checked once per
+    distinct value, so a batch of tags sharing SKUs costs at most one
+    (cached) encoding per SKU.
+    """
+    exceptions = {}
+    tag_width, tag_height = parse_tag_size(settings.tag_size)
+    max_width = tag_width * NAME_WIDTH_RATIO
+    bold_font = FONT_FAMILIES[settings.font_name][0]
+    font_size = settings.font_size * tag_height / REFERENCE_TAG_HEIGHT
+    barcode_width = barcode_box(tag_width, tag_height)[2]
+    barcode_issues = {}
+    if settings.barcode_type:
+        for value in {tag.get('barcode') for tag in tags}:
+            if value:
+                barcode_issues[value] = barcode_issue(value, settings.barcode_type, barcode_width)
+    
+    for i, tag in enumerate(tags):
+        tag_issues = []
+        
+        # Check product name length
+        text = tag['productName'].upper()
+        name_width = text_width(text, bold_font, font_size)
+        if name_width > max_width * 1.5:  # Using same tolerance as validate_tag_text
+            tag_issues.append({
+                'type': 'text_overflow',
+                'field': 'productName',
+                'content': text,
+                'message': f'Product name is {int((name_width/max_width)*100)}% of available width',
+                'width_ratio': name_width/max_width
+            })
+        # Fit the name now so rendering the tag is a layout cache hit
+        fit_text(tag['productName'], max_width, bold_font, font_size)
+        
+        issue = barcode_issues.get(tag.get('barcode'))
+        if issue:
+            tag_issues.append({
+                'type': 'barcode',
+                'field': 'barcode',
+                'content': tag['barcode'],
+                'message': issue,
+            })
+        
+        if tag_issues:
+            exceptions[i] = {
+                'tag': tag,
+                'issues': tag_issues
+            }
+    
+    return exceptions
+
+def refresh_missing_fields(tag):
+    """Recompute a tag's '_missing_fields', deriving the barcode from the SKU when it has none"""
+    current_missing_fields = []
+    for field in ('productName', 'sku', 'price'):
+        if not tag.get(field):
+            current_missing_fields.append(MISSING_FIELD_LABELS[field])
+    
+    # Auto-generate barcode if SKU is provided and barcode is empty or not yet generated
+    if tag.get('sku') and not tag.get('barcode'):
+        tag['barcode'] = ''.join(filter(str.isalnum, tag['sku']))
+    
+    # After potential auto-generation, check barcode again
+    if not tag.get('barcode'):
+         if tag.get('sku'): # Barcode should have been generated from SKU but might be empty if SKU was e.g. only symbols
+             current_missing_fields.append('Barcode (could not auto-generate from SKU)')
+         else: # No SKU, so no Barcode
+             if 'SKU' not in current_missing_fields: current_missing_fields.append('SKU (needed for Barcode)')
+             current_missing_fields.append('Barcode')
+    
+    tag['_missing_fields'] = list(set(current_missing_fields)) # Ensure unique fields & update tag
+    return tag['_missing_fields']
+
+class TagValidator:
+    """Incremental validation of a TagStore that is being edited
+    
+    Only tags marked dirty (new or changed) are re-validated and re-fitted by
+    validate(). The counts of selected, incomplete and selected-but-incomplete
+    tags come straight from the store's bitsets, so the validator only has to
+    hear about tags being added, changed or removed, and about the tag
+    settings they will be printed with (use_settings).
+    """
+    
+    def __init__(self, settings=DEFAULT_TAG_SETTINGS):
+        self.settings = settings  # TagSettings the tags are checked against
+        self.dirty = set()
+        self.exceptions = {}  # tag index -> text-fit and barcode issues from validate_tags
+    
+    def reset(self, tags):
+        """Forget everything and treat every tag as new"""
+        self.__init__(self.settings)
+        self.tags_appended(tags, len(tags))
+    
+    def use_settings(self, settings, tags):
+        """Check tags against settings from now on; True if that changes the checks, which marks every tag dirty"""
+        checked = ('tag_size', 'font_name', 'font_size', 'barcode_type')
+        changed = any(getattr(settings, name) != getattr(self.settings, name) for name in checked)
+        self.settings = settings
+        if changed:
+            self.dirty.update(range(len(tags)))
+        return changed
+    
+    def tags_appended(self, tags, count):
+        """Track the last `count` tags of the store, which were just added"""
+        self.dirty.update(range(len(tags) - count, len(tags)))
+    
+    def tags_removed(self, tags, removed):
+        """Drop the given indices, which were just removed from the store, and shift the ones after them"""
+        removed = sorted(set(removed))
+        
+        def shifted(idx):
+            return idx - bisect_left(removed, idx)
+        
+        gone = set(removed)
+        self.dirty = {shifted(idx) for idx in self.dirty if idx not in gone}
+        self.exceptions = {shifted(idx): issue for idx, issue in self.exceptions.items() if idx not in gone}
+    
+    def mark_dirty(self, idx):
+        self.dirty.add(idx)
+    
+    def validate(self, tags):
+        """Re-validate the dirty tags and return how many were checked"""
+        dirty = sorted(idx for idx in self.dirty if idx < len(tags))
+        self.dirty.clear()
+        if not dirty:
+            return 0
+        with timed('validate', count=len(dirty)):
+            batch = []
+            for idx in dirty:
+                tag = tags[idx]
+                refresh_missing_fields(tag)
+                batch.append(tag.to_dict())
+            issues = validate_tags(batch, self.settings)
+            for pos, idx in enumerate(dirty):
+                if pos in issues:
+                    self.exceptions[idx] = issues[pos]
+                else:
+                    self.exceptions.pop(idx, None)
+        return len(dirty)
@@ -1,24 +1,65 @@
 import streamlit as st
-import json
+import csv
 import io
 import tempfile
 import os
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.graphics.barcode import code128
-from PyPDF2 import PdfReader
-from pdf2image import convert_from_path
-import pytesseract
-import re
-from PIL import Image
-import numpy as np
+import time
+import threading
+import shutil
+import uuid
+import pandas as pd
+from pricetags.barcodes import BARCODE_SYMBOLOGIES
+from pricetags.cache import (OCR_CACHE_DIR, OCR_CACHE_MAX_DISK_BYTES, OCR_CACHE_MAX_MEMORY_ENTRIES, OcrResultCache,
+                             extract_tags_cached, ocr_cache_key)
+from pricetags.extraction import DEFAULT_OCR_WORKERS, OCR_BACKENDS
+from pricetags.imposition import TAG_SIZES
+from pricetags.importing import IMPORT_FORMATS, import_tags, tag_file_format
+from pricetags.repricing import apply_price_delta, diff_prices, load_price_feed
+from pricetags.quarter_store import QUARTER_STORE_MAX_BYTES, QUARTER_STORE_PATH, QuarterOcrStore
+from pricetags.store import TagStore
+from pricetags.validation import MISSING_FIELD_LABELS, TagValidator
+from pricetags.ocr import LOW_OCR_CONFIDENCE, OCR_DPI_LADDER
+from pricetags.rendering import (DEFAULT_RENDER_WORKERS, DEFAULT_TAG_SETTINGS, FONT_FAMILIES, PDF_OUTPUT_NAME, TagSettings,
+                                 bundle_pdf_files, imposition_for, tag_settings_from_json, write_tag_pdfs)
+from pricetags import reporting
+from pricetags.reporting import DEBUG_LOG_CAPACITY, DEBUG_LOG_MAX_BYTES, EventLog, format_event
+
+EXTRACTION_POLL_SECONDS = 0.75  # How often the page reruns while a background extraction is running
+# Tag editor: only one page of tags is turned into grid rows per rerun
+EDITOR_PAGE_SIZES = (25, 50, 100, 200)
+EDITOR_FILTERS = {
+    'all': "All tags",
+    'missing': "Missing fields only",
+    'selected': "Selected for PDF only",
+    'low_confidence': "Low OCR confidence only",
+}
+EDITOR_COLUMNS = {'productName': "Product Name", 'sku': "SKU", 'price': "Price"}
+MAX_LISTED_PROBLEM_TAGS = 20  # Problem tags listed one by one in the PDF section
+DEBUG_LOG_SHOWN = 200  # Most recent debug events shown in the troubleshooting log
+DEBUG_LOG_MAX_AGE = 24 * 3600  # Seconds after which the log file of an idle (usually ended) session is deleted
+MAX_REPORTED_PRICE_ROWS = 200  # Rows per table in the price update report
+# Sidebar tag setting -> (min, max) of its widget, so imported settings always fit
+TAG_SETTING_LIMITS = {'tag_font_size': (8, 24), 'tag_price_size': (8, 36), 'tag_sheet_margin': (0.1, 1.0)}
 
 st.set_page_config(page_title="Price Tag Generator", layout="wide")
 st.title("Price Tag Generator ")
 
+def remove_stale_debug_logs():
+    """Delete the JSONL log files of sessions that have not logged anything for DEBUG_LOG_MAX_AGE"""
+    log_dir = tempfile.gettempdir()
+    cutoff = time.time() - DEBUG_LOG_MAX_AGE
+    for name in os.listdir(log_dir):
+        if name.startswith('tagger_log_') and name.endswith(('.jsonl', '.jsonl.1')):
+            path = os.path.join(log_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
 # Initialize session state
 if 'tags' not in st.session_state:
-    st.session_state.tags = []
+    st.session_state.tags = TagStore()
 if 'uploaded_pdf_text' not in st.session_state:
     st.session_state.uploaded_pdf_text = None
 if 'tag_exceptions' not in st.session_state:
@@ -26,7 +67,39 @@ if 'tag_exceptions' not in st.session_state:
 if 'resolved_tags' not in st.session_state:
     st.session_state.resolved_tags = {}
 if 'debug_log' not in st.session_state:
-    st.session_state.debug_log = []
+    # Bounded in memory; the full log is streamed to a JSONL file for download
+    remove_stale_debug_logs()
+    log_fd, log_path = tempfile.mkstemp(prefix='tagger_log_', suffix='.jsonl')
+    os.close(log_fd)
+    st.session_state.debug_log = EventLog(DEBUG_LOG_CAPACITY, path=log_path, max_bytes=DEBUG_LOG_MAX_BYTES)
+if 'source_pdf_key' not in st.session_state:
+    st.session_state.source_pdf_key = None
+if 'extraction_job' not in st.session_state:
+    st.session_state.extraction_job = None
+    st.session_state.session_id = uuid.uuid4().hex  # Owner of the session's extraction jobs
+    st.session_state.job_tags_synced = 0
+    st.session_state.job_log_synced = 0
+if 'pdf_output_dir' not in st.session_state:
+    st.session_state.pdf_output_dir = None
+if 'tag_validator' not in st.session_state:
+    st.session_state.tag_validator = TagValidator()  # Tracks which tags need re-validation
+if 'editor_version' not in st.session_state:
+    st.session_state.editor_version = 0  # Bumped whenever tags change outside the grid, to drop its stale edits
+    st.session_state.editor_notices = []
+if 'tag_font_name' not in st.session_state:
+    # Sidebar tag settings live in session state so an imported Tags.json can set them
+    st.session_state.tag_font_name = DEFAULT_TAG_SETTINGS.font_name
+    st.session_state.tag_font_size = int(DEFAULT_TAG_SETTINGS.font_size)
+    st.session_state.tag_price_size = int(DEFAULT_TAG_SETTINGS.price_size)
+    st.session_state.tag_sheet_margin = DEFAULT_TAG_SETTINGS.sheet_margin
+    st.session_state.tag_size = DEFAULT_TAG_SETTINGS.tag_size
+    st.session_state.tag_crop_marks = DEFAULT_TAG_SETTINGS.crop_marks
+    st.session_state.tag_barcode_type = DEFAULT_TAG_SETTINGS.barcode_type or 'None'
+if 'import_notices' not in st.session_state:
+    st.session_state.import_notices = []
+if 'price_report' not in st.session_state:
+    st.session_state.price_report = None  # Outcome of the last price feed
+    st.session_state.price_notices = []
 
 def update_tag_selection(idx, checkbox_key):
     """Update a tag's selected_for_print status based on checkbox change"""
@@ -39,584 +112,753 @@ def update_tag_selection(idx, checkbox_key):
     else:
         add_to_debug_log(f"Error: Invalid tag index {idx} in update_tag_selection")
 
-def split_image_into_quarters(image):
-    """Split the image into four equal quarters"""
-    width, height = image.size
-    mid_w = width // 2
-    mid_h = height // 2
-    
-    # Split into quarters
-    quarters = [
-        # Top left
-        image.crop((0, 0, mid_w, mid_h)),
-        # Top right
-        image.crop((mid_w, 0, width, mid_h)),
-        # Bottom left
-        image.crop((0, mid_h, mid_w, height)),
-        # Bottom right
-        image.crop((mid_w, mid_h, width, height))
-    ]
-    
-    return quarters
+def add_to_debug_log(message):
+    """Add message to debug log"""
+    st.session_state.debug_log.log(message)
 
-def process_quarter(image, quarter_num):
-    """Process a single quarter of the page"""
-    # Convert to RGB if needed
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    # Extract text with custom configuration
-    custom_config = r'--oem 3 --psm 6'
-    text = pytesseract.image_to_string(image, config=custom_config)
-    
-    # Add to debug log instead of showing directly
-    add_to_debug_log(f"Quarter {quarter_num + 1} Text:\n{text}\n")
-    
-    # Parse the text for this quarter
-    tag = parse_single_tag(text)
-    return tag
+def notify_user(level, message):
+    """Show an error or warning"""
+    if level == 'error':
+        st.error(message)
+    else:
+        st.warning(message)
 
-def parse_single_tag(text):
-    """Parse text from a single tag"""
-    try:
-        lines = text.split('\n')
-        tag = {}
-        
-        # Find category (Hearth > XXX)
-        for line in lines:
-            if 'Hearth >' in line:
-                tag['description'] = line.strip()
-                break
-        
-        # Find Model number
-        model_line_idx = None
-        for i, line in enumerate(lines):
-            if 'Model #:' in line:
-                sku = line.replace('Model #:', '').strip()
-                tag['sku'] = sku
-                tag['barcode'] = ''.join(filter(str.isalnum, sku))
-                model_line_idx = i
-                break
-        
-        # Find price - only look for standalone price
-        price_line_idx = None
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line.startswith('$') and any(c.isdigit() for c in line):
-                tag['price'] = line.replace('$', '').strip()
-                price_line_idx = i
-                break
-        
-        # Find product name - combine all relevant lines between model and price
-        if model_line_idx is not None and price_line_idx is not None:
-            product_lines = []
-            for line in lines[model_line_idx + 1:price_line_idx]:
-                line = line.strip()
-                if (len(line) > 0 and 
-                    'Hearth >' not in line and
-                    'Contracts Available' not in line and
-                    'Fireplace Distributors' not in line and
-                    'Regular Price:' not in line and
-                    not line.startswith('$')):
-                    product_lines.append(line)
-            
-            if product_lines:
-                # Join all product lines, replacing multiple spaces with single space
-                tag['productName'] = ' '.join(' '.join(product_lines).split())
-        
-        # Ensure all required fields are present, if not, mark them
-        required_fields = ['sku', 'productName', 'price', 'barcode']
-        missing_fields = []
-        for field in required_fields:
-            if field not in tag or not tag[field]: # Check if field is missing or empty
-                tag[field] = "" # Set to empty string if missing
-                if field not in ['barcode']: # Barcode is derived, so don't mark as user-missing if SKU is there
-                    missing_fields.append(field)
-        
-        # If SKU is present but barcode is missing (e.g. from manual add), generate it
-        if tag.get('sku') and not tag.get('barcode') and 'barcode' in missing_fields:
-            tag['barcode'] = ''.join(filter(str.isalnum, tag['sku']))
-            if 'barcode' in missing_fields: # Re-evaluate if barcode is still missing
-                 missing_fields.remove('barcode')
-
-        # Special handling if productName is missing but other fields might imply it's an OCR error for a whole tag
-        if not tag.get('productName') and not tag.get('sku') and not tag.get('price'):
-             # If all key identifiable fields are missing, it's likely not a valid tag segment
-             add_to_debug_log(f"Skipping segment due to multiple missing core fields: {lines}")
-             return None # Indicate no valid tag found
-
-        tag['_missing_fields'] = missing_fields
-        return tag
-            
-    except Exception as e:
-        st.write(f"Error parsing tag: {str(e)}")
-        return None
+def route_core_events():
+    """Send the core's debug events and notices from the current thread to this session
+    
+    Handlers are per thread, and widget callbacks run on a new script thread
+    before the script body, so every callback that calls into the core starts with this.
+    """
+    reporting.set_handlers(st.session_state.debug_log.add, notify_user)
 
-def add_to_debug_log(message):
-    """Add message to debug log"""
-    st.session_state.debug_log.append(message)
+# Core code called from this script thread logs into the session; background jobs route their own thread
+route_core_events()
 
 def show_debug_log():
     """Show debug information in expandable section"""
     with st.expander("🔧 Troubleshooting Log"):
         st.write("This section contains technical details useful for troubleshooting:")
+        debug_log = st.session_state.debug_log
         
-        # Add download button for log
-        log_text = "\n".join(st.session_state.debug_log)
-        st.download_button(
-            label="Download Log",
-            data=log_text,
-            file_name="tagger_debug.log",
-            mime="text/plain"
-        )
-        
-        # Show log in scrollable area
-        st.code(log_text)
-
-def extract_text_from_pdf(pdf_path):
-    """Convert PDF to images and extract text from quarters"""
-    all_tags = []
-    
-    try:
-        # Convert PDF to images with higher DPI for better OCR
-        add_to_debug_log(f"Processing PDF: {pdf_path}")
-        images = convert_from_path(
-            pdf_path,
-            dpi=300,
-            fmt='png'
-        )
-        
-        if not images:
-            error_msg = "No pages found in PDF"
-            add_to_debug_log(f"Error: {error_msg}")
-            st.error(error_msg)
-            return []
+        # Where the time went, per page, quarter or tag
+        stage_rows, pages_per_second = debug_log.summary()
+        if stage_rows:
+            if pages_per_second:
+                st.metric("Extraction speed", f"{pages_per_second:.2f} pages/sec")
+            st.dataframe(pd.DataFrame(stage_rows).set_index('stage'), use_container_width=True)
         
-        for i, image in enumerate(images):
-            add_to_debug_log(f"\nProcessing page {i+1}")
-            
+        # The log file is only read in the run where a download is asked for, and not kept afterwards
+        if st.button("Prepare Log Download"):
             try:
-                # Split image into quarters
-                quarters = split_image_into_quarters(image)
-                
-                # Process each quarter
-                for j, quarter in enumerate(quarters):
-                    try:
-                        tag = process_quarter(quarter, j) # process_quarter calls parse_single_tag
-                        if tag: # parse_single_tag now returns a dict (even with missing fields) or None
-                            tag['selected_for_print'] = False # Initialize selection state
-                            all_tags.append(tag)
-                            if not tag.get('_missing_fields'):
-                                add_to_debug_log(f"Successfully extracted complete tag: {tag.get('sku', 'N/A')} on page {i+1}, quarter {j+1}")
-                            else:
-                                add_to_debug_log(f"Extracted tag with missing fields: {tag.get('sku', 'N/A')}, Missing: {tag['_missing_fields']} on page {i+1}, quarter {j+1}")
-                        else:
-                            # This 'else' means parse_single_tag returned None, indicating not a valid tag segment
-                            add_to_debug_log(f"Skipping invalid/empty segment in page {i+1}, quarter {j+1}")
-                    except Exception as e:
-                        add_to_debug_log(f"Error processing quarter {j+1} on page {i+1}: {str(e)}")
-                        continue
-                        
-            except Exception as e:
-                add_to_debug_log(f"Error processing page {i+1}: {str(e)}")
-                continue
-                
-        if not all_tags:
-            error_msg = "No valid tags found in the PDF. Check if the format matches the expected layout."
-            add_to_debug_log(f"Error: {error_msg}")
-            st.warning(error_msg)
-            
-    except Exception as e:
-        error_msg = f"Error processing PDF: {str(e)}"
-        add_to_debug_log(f"Critical Error: {error_msg}")
-        st.error(error_msg)
-        return []
+                log_data, partial = debug_log.read_jsonl()
+            except OSError as e:
+                st.warning(f"Could not read the log file: {e}")
+            else:
+                st.download_button(
+                    label="Download Log (JSONL)",
+                    data=log_data,
+                    file_name="tagger_debug.jsonl",
+                    mime="application/x-ndjson",
+                    help="The link lasts until the page next reruns"
+                )
+                if partial:
+                    st.caption(f"Partial log: only about the last {2 * DEBUG_LOG_MAX_BYTES // (1024 * 1024)} MB of events are kept")
         
-    return all_tags
-
-def validate_tag_text(text, max_width, font_name='Helvetica-Bold', font_size=12):
-    """Calculate if text will fit within max_width"""
-    from reportlab.pdfbase import pdfmetrics
+        # Show the most recent events in scrollable area
+        st.caption(f"Last {DEBUG_LOG_SHOWN} of {debug_log.total} events")
+        st.code("\n".join(format_event(event) for event in debug_log.recent(DEBUG_LOG_SHOWN)))
+
+@st.cache_resource
+def get_ocr_cache():
+    """Process-wide OCR cache shared across reruns and sessions"""
+    return OcrResultCache(OCR_CACHE_DIR, OCR_CACHE_MAX_DISK_BYTES, OCR_CACHE_MAX_MEMORY_ENTRIES)
+
+@st.cache_resource
+def get_quarter_store():
+    """Server-wide store of OCR results per page quarter, so no quarter image is OCRed twice"""
+    return QuarterOcrStore(QUARTER_STORE_PATH, QUARTER_STORE_MAX_BYTES)
+
+class ExtractionJob:
+    """Background extraction of one uploaded PDF
     
-    # Split text into lines if it contains the separator
-    lines = text.split('|')
+    extract_tags_cached runs on a daemon thread. Tags are published as pages
+    finish, and the job keeps its own debug log and user notices, so the
+    session that started it can follow it across reruns.
+    """
     
-    # Check each line separately
-    for i, line in enumerate(lines):
-        text_width = pdfmetrics.stringWidth(line.strip().upper(), font_name, font_size)
-        # First line can be longer than second line
-        max_allowed = max_width * (1.5 if i == 0 else 1.2)
-        if text_width > max_allowed:
-            return False
-    return True
-
-def validate_tags(tags):
-    """Check all tags for potential issues"""
-    exceptions = {}
-    max_width = 3.6 * inch  # 4 inch tag width minus margins
+    def __init__(self, pdf_bytes, cache_key, cache, extract_options):
+        self.cache_key = cache_key
+        self.status = 'running'  # running, done, cancelled or failed
+        self.tags = []
+        self.done_quarters = 0
+        self.total_quarters = 0
+        self.log = EventLog()
+        self.messages = []
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(pdf_bytes, cache, extract_options),
+            name=f"extract-{cache_key[:12]}",
+            daemon=True
+        )
     
-    for i, tag in enumerate(tags):
-        tag_issues = []
-        
-        # Check product name length
-        text = tag['productName'].upper()
-        from reportlab.pdfbase import pdfmetrics
-        text_width = pdfmetrics.stringWidth(text, 'Helvetica-Bold', 12)
-        if text_width > max_width * 1.5:  # Using same tolerance as validate_tag_text
-            tag_issues.append({
-                'type': 'text_overflow',
-                'field': 'productName',
-                'content': text,
-                'message': f'Product name is {int((text_width/max_width)*100)}% of available width',
-                'width_ratio': text_width/max_width
-            })
-        
-        if tag_issues:
-            exceptions[i] = {
-                'tag': tag,
-                'issues': tag_issues
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def _run(self, pdf_bytes, cache, extract_options):
+        reporting.set_handlers(self.log.add, self.add_message)
+        try:
+            tags = extract_tags_cached(
+                pdf_bytes,
+                self.cache_key,
+                cache=cache,
+                progress=self._publish,
+                cancel_event=self.cancel_event,
+                **extract_options
+            )
+            with self._lock:
+                self.tags = tags
+                self.done_quarters = self.total_quarters
+                self.status = 'cancelled' if self.cancel_event.is_set() else 'done'
+        except Exception as e:
+            self.log.log(f"Critical Error: background extraction failed: {str(e)}")
+            self.add_message('error', f"Error processing PDF: {str(e)}")
+            with self._lock:
+                self.status = 'failed'
+        finally:
+            reporting.set_handlers()
+    
+    def _publish(self, done_quarters, total_quarters, tags):
+        with self._lock:
+            self.done_quarters = done_quarters
+            self.total_quarters = total_quarters
+            self.tags = tags
+    
+    def add_message(self, level, message):
+        with self._lock:
+            self.messages.append((level, message))
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def snapshot(self):
+        """Consistent view of the job's progress for the script thread"""
+        with self._lock:
+            return {
+                'status': self.status,
+                'done': self.done_quarters,
+                'total': self.total_quarters,
+                'tags': self.tags,
+                'messages': list(self.messages),
             }
     
-    return exceptions
+    def log_since(self, start):
+        """Debug events from number `start` on, and the number to continue from"""
+        return self.log.since(start)
+
+@st.cache_resource
+def get_extraction_jobs():
+    """Extraction jobs by (session id, OCR cache key) and the lock guarding them, shared across reruns and sessions"""
+    return {}, threading.Lock()
 
-def auto_split_text(text, max_width, c, initial_font_size=12):
-    """Automatically split and size text to fit within max_width"""
-    from reportlab.pdfbase import pdfmetrics
+def start_extraction_job(pdf_bytes, cache_key, **extract_options):
+    """Start this session's background job for the upload, or re-attach to its job already running
+    
+    Jobs belong to one session, so cancelling never stops another user's
+    extraction of the same file. A session's jobs for other files are
+    cancelled, as their tags are no longer wanted.
+    """
+    jobs, lock = get_extraction_jobs()
+    session_id = st.session_state.session_id
+    with lock:
+        job = jobs.get((session_id, cache_key))
+        if job is not None and job.status in ('running', 'done'):
+            add_to_debug_log(f"Attaching to existing extraction job for {cache_key[:12]}")
+            return job
+        
+        for (owner, _), other in jobs.items():
+            if owner == session_id:
+                other.cancel()
+        # Finished results live in the OCR cache, so only running jobs need to be kept
+        for key in [key for key, other in jobs.items() if other.status != 'running']:
+            del jobs[key]
+        extract_options = dict(extract_options, quarter_store=get_quarter_store())
+        job = ExtractionJob(pdf_bytes, cache_key, get_ocr_cache(), extract_options).start()
+        jobs[session_id, cache_key] = job
+    return job
+
+def sync_extraction_job(job):
+    """Copy the job's newly published tags and log lines into this session
+    
+    Published tags only ever grow at the end, so the session's store copies
+    in the new ones and keeps any edits made to earlier tags.
+    """
+    snapshot = job.snapshot()
+    published = snapshot['tags']
+    if len(published) > st.session_state.job_tags_synced:
+        new_tags = published[st.session_state.job_tags_synced:]
+        st.session_state.tags.extend(new_tags)
+        st.session_state.tag_validator.tags_appended(st.session_state.tags, len(new_tags))
+        st.session_state.job_tags_synced = len(published)
+    
+    new_log, st.session_state.job_log_synced = job.log_since(st.session_state.job_log_synced)
+    st.session_state.debug_log.extend(new_log)
+    return snapshot
+
+def get_pdf_output_dir():
+    """Return this session's PDF output directory, emptied of any previous run's files"""
+    out_dir = st.session_state.pdf_output_dir
+    if out_dir and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir = tempfile.mkdtemp(prefix='tagger_pdf_')
+    st.session_state.pdf_output_dir = out_dir
+    return out_dir
+
+def low_confidence_fields(tag):
+    """Fields that zone-based OCR read with low confidence and that are not already missing"""
+    missing = tag.get('_missing_fields', [])
+    return {
+        field: conf for field, conf in tag.get('_confidence', {}).items()
+        if conf < LOW_OCR_CONFIDENCE and MISSING_FIELD_LABELS.get(field, field) not in missing
+    }
+
+def matching_tag_indices(filter_name):
+    """Indices of the tags shown by an editor filter, read from the store's bitsets where possible"""
+    tags = st.session_state.tags
+    if filter_name == 'missing':
+        return list(tags.incomplete.indices())
+    if filter_name == 'selected':
+        return list(tags.selected.indices())
+    if filter_name == 'low_confidence':
+        return [idx for idx in tags.confidence_indices() if low_confidence_fields(tags[idx])]
+    return range(len(tags))
+
+def set_all_tags_selected(selected):
+    st.session_state.tags.set_all_selected(selected)
+    st.session_state.editor_version += 1
+
+def show_selection_controls():
+    """Select All / Deselect All buttons and the selected tag count"""
+    col1_buttons, col2_buttons, col3_info = st.columns([1, 1, 2])
+    with col1_buttons:
+        st.button("Select All Tags", key="select_all_callback_btn_v2", on_click=set_all_tags_selected, args=(True,))
+
+    with col2_buttons:
+        st.button("Deselect All", key="deselect_all_callback_btn_v2", on_click=set_all_tags_selected, args=(False,))
+
+    # Display tag count information
+    with col3_info:
+        st.write(f"Selected: {st.session_state.tags.selected_count()} of {len(st.session_state.tags)} tags")
+    st.write("") # Spacer
+
+def apply_tag_settings(settings, tag_size=None):
+    """Put a Tags.json 'settings' block and 'tagSize' into the sidebar tag settings, clamped to the widgets' ranges"""
+    tag_settings = tag_settings_from_json(settings, tag_size=tag_size)
+    values = {
+        'tag_font_name': tag_settings.font_name,
+        'tag_font_size': int(round(tag_settings.font_size)),
+        'tag_price_size': int(round(tag_settings.price_size)),
+        'tag_sheet_margin': tag_settings.sheet_margin,
+        'tag_size': tag_settings.tag_size,
+        'tag_crop_marks': tag_settings.crop_marks,
+        'tag_barcode_type': tag_settings.barcode_type or 'None',
+    }
+    for key, value in values.items():
+        if key in TAG_SETTING_LIMITS:
+            low, high = TAG_SETTING_LIMITS[key]
+            value = min(max(value, low), high)
+        st.session_state[key] = value
+
+def import_tag_file():
+    """Append the tags of the uploaded Tags.json / JSONL / CSV file to the session, without OCR
     
-    text = text.upper()
+    Runs as the button callback, before the script reruns and before the
+    sidebar settings widgets are created, so a Tags.json 'settings' block can
+    still set them.
+    """
+    route_core_events()
+    uploaded = st.session_state.get('import_file')
+    if uploaded is None:
+        st.session_state.import_notices = [('warning', "Choose a Tags.json, JSONL or CSV file to import first.")]
+        return
+    tags = st.session_state.tags
+    validator = st.session_state.tag_validator
+    before = len(tags)
+    uploaded.seek(0)
+    f = io.TextIOWrapper(uploaded, encoding='utf-8-sig', newline='')
+    try:
+        count, meta = import_tags(f, tag_file_format(uploaded.name), tags)
+        notices = []
+    except (ValueError, csv.Error) as e:
+        count, meta = len(tags) - before, {}
+        notices = [('error', f"Import of {uploaded.name} stopped: {e}")]
+    finally:
+        f.detach()  # Leave the uploaded buffer open for later reruns
+    
+    if count:
+        validator.tags_appended(tags, count)
+        validator.validate(tags)
+    if meta.get('settings') or meta.get('tagSize'):
+        apply_tag_settings(meta.get('settings'), meta.get('tagSize'))
+        notices.append(('info', f"Tag settings taken from {uploaded.name}."))
+    notices.insert(0, ('success', f"Imported {count} tags from {uploaded.name}.") if count else
+                   ('warning', f"No tags found in {uploaded.name}."))
+    st.session_state.import_notices = notices
+    st.session_state.editor_version += 1
+
+def apply_price_feed():
+    """Reprice the session's tags from the uploaded price feed and select only the changed ones for printing"""
+    route_core_events()
+    uploaded = st.session_state.get('price_feed_file')
+    tags = st.session_state.tags
+    if uploaded is None or not tags:
+        st.session_state.price_notices = [('warning', "Load or import tags and choose a price feed first.")]
+        return
+    uploaded.seek(0)
+    f = io.TextIOWrapper(uploaded, encoding='utf-8-sig', newline='')
+    try:
+        feed = load_price_feed(f, tag_file_format(uploaded.name))
+    except (ValueError, csv.Error) as e:
+        st.session_state.price_notices = [('error', f"Could not read price feed {uploaded.name}: {e}")]
+        return
+    finally:
+        f.detach()  # Leave the uploaded buffer open for later reruns
     
-    # Function to check if text fits
-    def text_fits(text, font_size, max_width_ratio=1.5):
-        return pdfmetrics.stringWidth(text, 'Helvetica-Bold', font_size) <= max_width * max_width_ratio
+    delta = diff_prices(tags, feed)
+    changed = apply_price_delta(tags, delta)
+    validator = st.session_state.tag_validator
+    for idx in changed:
+        validator.mark_dirty(idx)
+    validator.validate(tags)
+    # Only the repriced tags go to the PDF
+    tags.set_all_selected(False)
+    for idx in changed:
+        tags.selected[idx] = True
     
-    # Try to find natural split points
-    split_candidates = [
-        # Split before "BAGGED" or "FLAT"
-        lambda t: t.find(", BAGGED"),
-        lambda t: t.find(", FLAT"),
-        # Split before parentheses
-        lambda t: t.find(" ("),
-        # Split after measurements (before descriptive text)
-        lambda t: next((i for i, c in enumerate(t) if c.isalpha() and 
-                       i > 0 and (t[i-1].isdigit() or t[i-1] in 'X/')), -1),
-        # Split at comma
-        lambda t: t.find(","),
-        # Split at last space in first half
-        lambda t: t.rfind(" ", 0, len(t)//2 + 10)
+    # The report keeps copies of the rows, so it stays right when tags are edited or removed later
+    st.session_state.price_report = {
+        'feed': uploaded.name,
+        'counts': {'Changed': len(delta.changed), 'Added': len(delta.added), 'Not in feed': len(delta.removed),
+                   'Unchanged': delta.unchanged},
+        'Changed': [{'Tag': idx + 1, 'Product Name': tags[idx]['productName'], 'SKU': tags[idx]['sku'],
+                     'Old Price': old_price, 'New Price': new_price}
+                    for idx, old_price, new_price in delta.changed[:MAX_REPORTED_PRICE_ROWS]],
+        'Added': [{'Product Name': row['productName'], 'SKU': row['sku'], 'Barcode': row['barcode'], 'Price': row['price']}
+                  for row in delta.added[:MAX_REPORTED_PRICE_ROWS]],
+        'Not in feed': [{'Tag': idx + 1, 'Product Name': tags[idx]['productName'], 'SKU': tags[idx]['sku'],
+                         'Price': tags[idx]['price']}
+                        for idx in delta.removed[:MAX_REPORTED_PRICE_ROWS]],
+    }
+    st.session_state.price_notices = [
+        ('success', f"{len(changed)} tag(s) repriced from {uploaded.name} and selected for the PDF.") if changed else
+        ('info', f"No prices changed in {uploaded.name}.")
     ]
+    st.session_state.editor_version += 1
+
+def show_price_report():
+    """Counts and (the first rows of) the changed, added and unlisted items of the last price feed"""
+    for level, message in st.session_state.price_notices:
+        getattr(st, level)(message)
+    st.session_state.price_notices = []
+    report = st.session_state.price_report
+    if report is None:
+        return
+    st.caption(f"Last price feed: {report['feed']}")
+    for column, (label, count) in zip(st.columns(len(report['counts'])), report['counts'].items()):
+        column.metric(label, count)
+    for label in ('Changed', 'Added', 'Not in feed'):
+        if report[label]:
+            with st.expander(f"{label} ({report['counts'][label]})"):
+                if report['counts'][label] > len(report[label]):
+                    st.caption(f"First {len(report[label])} of {report['counts'][label]}")
+                st.dataframe(pd.DataFrame(report[label]), use_container_width=True, hide_index=True)
+
+def editor_rows(indices):
+    """Grid rows for the tags at indices, labelled with their 1-based tag numbers"""
+    tags = st.session_state.tags
+    exceptions = st.session_state.tag_validator.exceptions
+    rows = []
+    for idx in indices:
+        tag = tags[idx]
+        low_confidence = low_confidence_fields(tag)
+        issues = list(tag.get('_missing_fields', []))
+        if low_confidence:
+            issues.append("check " + ', '.join(f"{field} ({conf}%)" for field, conf in low_confidence.items()))
+        issues.extend(issue['message'] for issue in exceptions.get(idx, {}).get('issues', ()) if issue['type'] == 'barcode')
+        rows.append({
+            'Select': tag.get('selected_for_print', False),
+            'Product Name': tag.get('productName', ''),
+            'SKU': tag.get('sku', ''),
+            'Price': tag.get('price', ''),
+            'Barcode': tag.get('barcode', ''),
+            'Issues': '; '.join(issues),
+            'Remove': False,
+        })
+    return pd.DataFrame(rows, index=pd.Index([idx + 1 for idx in indices], name="Tag"))
+
+def save_tag_edits(editor_key, indices):
+    """Apply the grid's edits to the tags shown on this page and re-validate the changed ones
     
-    # Try each split point with original font size
-    font_size = initial_font_size
-    for get_split_point in split_candidates:
-        split_point = get_split_point(text)
-        if split_point > 0:
-            line1 = text[:split_point].strip()
-            line2 = text[split_point:].strip(" ,()")
-            
-            if text_fits(line1, font_size, 1.5) and text_fits(line2, font_size, 1.2):
-                return [line1, line2], font_size
+    Runs as the submit callback, before the script reruns, so the grid is
+    rebuilt from the saved tags straight away.
+    """
+    route_core_events()
+    edits = st.session_state.get(editor_key, {}).get('edited_rows', {})
+    tags = st.session_state.tags
+    validator = st.session_state.tag_validator
+    notices = []
+    removed = []
+    for pos, changes in edits.items():
+        idx = indices[pos]
+        tag = tags[idx]
+        if changes.get('Remove'):
+            removed.append(idx)
+            continue
+        for field, column in EDITOR_COLUMNS.items():
+            if column in changes:
+                value = (changes[column] or '').strip()
+                if field == 'price':
+                    value = value.replace('$', '').strip()
+                    try:
+                        if value:
+                            float(value)  # This will raise ValueError if not a valid number
+                    except ValueError:
+                        notices.append(('error', f"Tag {idx + 1}: '{value}' is not a valid price (numbers only), kept {tag.get('price', '')!r}"))
+                        continue
+                tag[field] = value
+                validator.mark_dirty(idx)
+        if 'SKU' in changes:
+            tag['barcode'] = ''  # Re-derived from the new SKU below
+        if 'Select' in changes:
+            tag['selected_for_print'] = bool(changes['Select'])
+    if removed:
+        tags.delete(removed)
+        validator.tags_removed(tags, removed)
     
-    # If no good split point found, try reducing font size
-    while font_size >= 9:
-        # Try splitting at the middle
-        mid_point = len(text) // 2
-        split_point = text.rfind(" ", 0, mid_point + 10)
-        if split_point > 0:
-            line1 = text[:split_point].strip()
-            line2 = text[split_point:].strip()
-            if text_fits(line1, font_size, 1.5) and text_fits(line2, font_size, 1.2):
-                return [line1, line2], font_size
-        font_size -= 1
+    validated = validator.validate(tags)
+    add_to_debug_log(f"Saved edits: re-validated {validated} changed tag(s), removed {len(removed)}")
     
-    # Last resort: force split at midpoint with smallest font
-    mid_point = len(text) // 2
-    split_point = text.rfind(" ", 0, mid_point + 10)
-    if split_point > 0:
-        return [text[:split_point].strip(), text[split_point:].strip()], 9
+    if removed:
+        notices.append(('info', f"Removed {len(removed)} tag(s)."))
+    if tags.problematic_count():
+        notices.append(('error', "Changes saved, but one or more SELECTED tags still have missing information. Filter on 'Missing fields only' to review them."))
+    else:
+        notices.append(('success', "Changes saved and all tags validated! Selected tags (if any) are ready for PDF generation."))
+    st.session_state.editor_notices = notices
+    st.session_state.editor_version += 1
+
+def show_tag_editor():
+    """Paginated grid editor over st.session_state.tags
     
-    return [text], 9
-
-def generate_pdf(tags_to_print):
-    buffer = io.BytesIO()
-    page_width = 8.5 * inch
-    page_height = 11 * inch
-    tag_width = 4 * inch
-    tag_height = 1.5 * inch
+    Only the tags on the current page become grid rows, so a rerun costs the
+    same whether the session holds 50 tags or 50,000.
+    """
+    col_filter, col_size, col_page = st.columns([2, 1, 1])
+    with col_filter:
+        filter_name = st.selectbox("Show", list(EDITOR_FILTERS), format_func=EDITOR_FILTERS.get, key="editor_filter")
+    with col_size:
+        page_size = st.selectbox("Tags per page", EDITOR_PAGE_SIZES, key="editor_page_size")
     
-    c = canvas.Canvas(buffer, pagesize=(page_width, page_height))
+    matching = matching_tag_indices(filter_name)
+    page_count = max(1, -(-len(matching) // page_size))
+    if st.session_state.get('editor_page', 1) > page_count:
+        st.session_state.editor_page = page_count
+    with col_page:
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, key="editor_page")
+    indices = matching[(page - 1) * page_size:page * page_size]
     
-    # Calculate starting positions
-    left_margin = (page_width - tag_width) / 2
-    top_margin = page_height - inch
+    for level, message in st.session_state.editor_notices:
+        getattr(st, level)(message)
+    st.session_state.editor_notices = []
     
-    # Process tags in groups of 6
-    if not tags_to_print:
-        add_to_debug_log("generate_pdf called with no tags to print.")
-        return None # Or handle as an empty PDF if preferred
+    if not indices:
+        st.info("No tags match this filter.")
+        return
     
-    for i in range(0, len(tags_to_print), 6):
-        group = tags_to_print[i:i+6]
-        y_position = top_margin
-        
-        for tag in group:
-            # Draw blue bar at bottom of tag
-            c.setFillColorRGB(0, 0.3, 0.8)  # Dark blue
-            c.rect(left_margin, y_position - tag_height + 0.1*inch, 
-                  tag_width, 0.2*inch, fill=1)
-            c.setFillColorRGB(0, 0, 0)  # Back to black
-            
-            # Draw tag border
-            c.setLineWidth(1)
-            c.rect(left_margin, y_position - tag_height, tag_width, tag_height)
-            
-            # Auto-split and size product name
-            lines, font_size = auto_split_text(tag['productName'], 3.6 * inch, c)
-            
-            # Draw product name
-            c.setFont('Helvetica-Bold', font_size)
-            
-            # Calculate vertical spacing based on number of lines
-            if len(lines) == 1:
-                start_y = y_position - 0.45*inch
-                line_spacing = 0
-            else:
-                start_y = y_position - 0.35*inch  # Start higher for two lines
-                line_spacing = 0.15 * inch
-            
-            # Draw each line centered
-            for i, line in enumerate(lines):
-                text_width = c.stringWidth(line, 'Helvetica-Bold', font_size)
-                x = left_margin + (tag_width - text_width) / 2
-                c.drawString(x, start_y - (i * line_spacing), line)
-            
-            # Draw model number in italics, centered
-            c.setFont('Helvetica-Oblique', 10)
-            model_text = f"Model: {tag['sku']}"
-            text_width = c.stringWidth(model_text, 'Helvetica-Oblique', 10)
-            x = left_margin + (tag_width - text_width) / 2
-            c.drawString(x, y_position - 0.8*inch, model_text)
-            
-            # Draw price (large and bold), centered
-            c.setFont('Helvetica-Bold', 14)
-            # Ensure price is properly formatted
-            price = tag['price'].strip().replace('$', '')
-            price_text = f"Price: ${price}"
-            text_width = c.stringWidth(price_text, 'Helvetica-Bold', 14)
-            x = left_margin + (tag_width - text_width) / 2
-            c.drawString(x, y_position - 1.1*inch, price_text)
-            
-            # Move to next tag position
-            y_position -= tag_height + 0.2*inch
-        
-        # Start new page if we have more tags
-        if i + 6 < len(tags_to_print):
-            c.showPage()
-            c.setFont('Helvetica', 12)
+    st.caption(f"Showing tags {(page - 1) * page_size + 1}-{(page - 1) * page_size + len(indices)} of {len(matching)} matching")
+    editor_key = f"tag_editor_{st.session_state.editor_version}_{filter_name}_{page_size}_{page}"
+    with st.form("tag_edit_form"):
+        st.data_editor(
+            editor_rows(indices),
+            key=editor_key,
+            use_container_width=True,
+            disabled=('Barcode', 'Issues'),
+            column_config={
+                'Select': st.column_config.CheckboxColumn("Select for PDF"),
+                'Price': st.column_config.TextColumn("Price", help="Enter the price without $ symbol"),
+                'Barcode': st.column_config.TextColumn("Barcode", help="Derived from the SKU"),
+                'Issues': st.column_config.TextColumn("Issues", help="Missing fields, low-confidence OCR and barcodes that cannot be printed"),
+                'Remove': st.column_config.CheckboxColumn("Remove", help="Delete this tag when saving"),
+            }
+        )
+        st.form_submit_button("Save Changes and Validate Tags", on_click=save_tag_edits, args=(editor_key, indices))
+
+def show_pdf_generation(tag_settings):
+    """PDF generation for the selected, complete tags, rendered with tag_settings"""
+    st.markdown("---")
+    # The store's bitsets say how many selected tags are ready without rescanning them
+    tags = st.session_state.tags
+    problematic_count = tags.problematic_count()
+
+    if not tags.selected_count():
+        st.info("No tags are currently selected for printing. Please select tags in the form and click 'Save Changes and Validate Tags'.")
+        # Disable button if no tags are selected
+        st.button("Generate PDF", type="primary", disabled=True, key="generate_pdf_button_disabled_no_selection")
+    else:
+        # Selected tags with missing fields (as determined by the last save)
+        if problematic_count:
+            st.error(f"Cannot generate PDF: {problematic_count} selected tag(s) still have missing information (marked with errors above). Please correct them and click 'Save Changes and Validate Tags' again.")
+            problematic_selected_tags = tags.selected_indices(complete=False)[:MAX_LISTED_PROBLEM_TAGS]
+            for prob_tag in map(tags.__getitem__, problematic_selected_tags):
+                st.warning(f"Tag '{prob_tag.get('productName', 'Unnamed')}' (SKU: {prob_tag.get('sku', 'N/A')}) is selected but has issues: {', '.join(prob_tag.get('_missing_fields', []))}")
+            if problematic_count > MAX_LISTED_PROBLEM_TAGS:
+                st.warning(f"...and {problematic_count - MAX_LISTED_PROBLEM_TAGS} more. Filter the editor on 'Missing fields only' to see them all.")
+            # Disable button if there are issues with selected tags
+            st.button("Generate PDF for Selected Tags", type="primary", disabled=True, key="generate_pdf_button_disabled_issues")
+        elif not tags.ready_count(): # Should only happen if some tags were selected but all had issues
+            st.info("No selected tags are ready for PDF generation. Please ensure selected tags are complete and saved.")
+            st.button("Generate PDF", type="primary", disabled=True, key="generate_pdf_button_disabled_none_ready")
+        else:
+            # All selected tags are valid, enable the button
+            pages_per_file = st.number_input(
+                "Pages per PDF file",
+                min_value=0,
+                value=0,
+                step=10,
+                help="0 writes a single PDF. Otherwise the output is split into files of this many pages and downloaded as a ZIP.",
+                key="pdf_pages_per_file"
+            )
+            render_workers = st.number_input(
+                "Render Workers",
+                min_value=1,
+                max_value=max(DEFAULT_RENDER_WORKERS, 32),
+                value=DEFAULT_RENDER_WORKERS,
+                help="Processes used to render large print runs; small runs always render in one process",
+                key="pdf_render_workers"
+            )
+            if st.button("Generate PDF for Selected Tags", type="primary", key="generate_pdf_button_final"):
+                with st.spinner("Generating PDF..."):
+                    tags_ready_for_pdf = tags.to_dicts(tags.selected_indices(complete=True))
+                    # Rendered to disk so large print runs are not held in a session buffer
+                    out_dir = get_pdf_output_dir()
+                    try:
+                        pdf_paths = write_tag_pdfs(tags_ready_for_pdf, out_dir, int(pages_per_file),
+                                                   workers=int(render_workers), settings=tag_settings)
+                    except Exception as e:
+                        # Caught here so a failed render never reaches the upload handler, which drops the tags
+                        add_to_debug_log(f"PDF generation failed: {e}")
+                        pdf_paths = []
+                    if pdf_paths:
+                        if len(pdf_paths) == 1:
+                            download_path, download_mime = pdf_paths[0], "application/pdf"
+                            st.success(f"PDF generated successfully with {len(tags_ready_for_pdf)} tags!")
+                        else:
+                            download_path = bundle_pdf_files(pdf_paths, os.path.join(out_dir, f"{PDF_OUTPUT_NAME}.zip"))
+                            download_mime = "application/zip"
+                            st.success(f"{len(tags_ready_for_pdf)} tags split into {len(pdf_paths)} PDF files of up to {int(pages_per_file)} pages!")
+                        with open(download_path, 'rb') as download_file:
+                            st.download_button(
+                                label="Download PDF of Selected Tags",
+                                data=download_file,
+                                file_name=os.path.basename(download_path),
+                                mime=download_mime,
+                                key="download_pdf_button_final_dl"
+                            )
+                    else:
+                        st.error("PDF generation failed or resulted in an empty document.")
+
+# OCR settings are read before the upload is processed
+with st.sidebar:
+    st.header("OCR Settings")
+    ocr_workers = st.number_input(
+        "OCR Workers",
+        min_value=1,
+        max_value=max(DEFAULT_OCR_WORKERS, 32),
+        value=DEFAULT_OCR_WORKERS,
+        help="Number of page quarters to OCR in parallel"
+    )
+    ocr_backend = st.selectbox(
+        "OCR Backend",
+        list(OCR_BACKENDS),
+        format_func=OCR_BACKENDS.get,
+        help="Batched mode starts far fewer tesseract processes; it is not used with zone-based OCR"
+    )
+    use_text_layer = st.checkbox(
+        "Use embedded PDF text",
+        value=True,
+        help="Read tags from the PDF's text layer and only OCR quarters without usable text"
+    )
+    zone_ocr = st.checkbox(
+        "Zone-based OCR",
+        value=False,
+        help="Learn where each field sits from the first tags and OCR only those regions afterwards"
+    )
+    adaptive_dpi = st.checkbox(
+        "Adaptive OCR resolution",
+        value=False,
+        help=f"OCR at {OCR_DPI_LADDER[0]} DPI first and re-OCR only quarters with missing fields at {OCR_DPI_LADDER[-1]} DPI"
+    )
+    quarter_stats = get_quarter_store().stats()
+    st.caption(
+        f"Shared OCR store: {quarter_stats['entries'] or 0} quarters ({(quarter_stats['bytes'] or 0) / 1e6:.1f} MB), "
+        f"{quarter_stats['hits']} reused / {quarter_stats['misses']} OCRed since the server started"
+    )
+
+# Tag settings are read before the PDF section renders with them
+with st.sidebar:
+    st.header("Tag Settings")
+    # An imported Tags.json may use a stock size the list does not have
+    tag_sizes = list(dict.fromkeys(TAG_SIZES + (st.session_state.tag_size,)))
+    tag_size = st.selectbox("Tag Size", tag_sizes, help="Size in inches (width x height)", key="tag_size")
+    
+    st.subheader("Font Settings")
+    font_name = st.selectbox("Font", list(FONT_FAMILIES), help="Select font family", key="tag_font_name")
+    font_size = st.number_input("Base Font Size", min_value=8, max_value=24, help="Largest size for the product name",
+                                key="tag_font_size")
+    price_size = st.number_input("Price Font Size", min_value=8, max_value=36, key="tag_price_size")
     
-    c.save()
-    buffer.seek(0)
-    return buffer
+    st.subheader("Sheet Layout")
+    sheet_margin = st.number_input("Sheet Margin (inches)", min_value=0.1, max_value=1.0, step=0.05,
+                                   help="Space between the sheet edge and the grid of tags", key="tag_sheet_margin")
+    crop_marks = st.checkbox("Crop marks", help="Mark every cut line in the sheet margin", key="tag_crop_marks")
+    barcode_type = st.selectbox("Barcode", list(BARCODE_SYMBOLOGIES) + ['None'], key="tag_barcode_type",
+                                help="Printed from each tag's barcode field, to the right of the price")
+    tag_settings = TagSettings(font_name, float(font_size), float(price_size), float(sheet_margin), tag_size,
+                               crop_marks, None if barcode_type == 'None' else barcode_type)
+    try:
+        imposition = imposition_for(tag_settings)
+    except ValueError as e:
+        st.error(f"{e}. Using {DEFAULT_TAG_SETTINGS.tag_size} tags instead.")
+        tag_settings = tag_settings._replace(tag_size=DEFAULT_TAG_SETTINGS.tag_size)
+        imposition = imposition_for(tag_settings)
+    st.caption(f"{imposition.columns} x {imposition.rows} = {imposition.per_page} tags per letter sheet")
+    # Names and barcodes are checked against the tag size, font and barcode type chosen here
+    if st.session_state.tag_validator.use_settings(tag_settings, st.session_state.tags):
+        st.session_state.tag_validator.validate(st.session_state.tags)
 
 # File upload section
 st.header("Upload Source PDF")
+extraction_running = False
 uploaded_file = st.file_uploader("Choose a PDF file", type=['pdf'])
 
 if uploaded_file:
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_file_path = tmp_file.name
-    
     try:
-        # Process the PDF and get tags
-        st.write("Processing PDF pages...")
-        tags = extract_text_from_pdf(tmp_file_path)
+        pdf_bytes = uploaded_file.getvalue()
+        pdf_cache_key = ocr_cache_key(
+            pdf_bytes,
+            use_text_layer=use_text_layer,
+            adaptive_dpi=adaptive_dpi,
+            zone_ocr=zone_ocr
+        )
+
+        # Only (re)load tags when a different file is uploaded, so reruns keep the user's edits
+        if st.session_state.get('source_pdf_key') != pdf_cache_key:
+            st.session_state.tags = TagStore()
+            st.session_state.tag_validator.reset(st.session_state.tags)
+            st.session_state.job_tags_synced = 0
+            st.session_state.job_log_synced = 0
+            st.session_state.extraction_job = start_extraction_job(
+                pdf_bytes,
+                pdf_cache_key,
+                workers=int(ocr_workers),
+                ocr_backend=ocr_backend,
+                use_text_layer=use_text_layer,
+                adaptive_dpi=adaptive_dpi,
+                zone_ocr=zone_ocr
+            )
+            st.session_state.source_pdf_key = pdf_cache_key
+        
+        # Pull in whatever the background extraction has published since the last rerun
+        job = st.session_state.extraction_job
+        if job is not None:
+            job_progress = sync_extraction_job(job)
+            # Newly arrived tags are validated (and their names fitted) once, as they come in
+            st.session_state.tag_validator.validate(st.session_state.tags)
+            extraction_running = job_progress['status'] == 'running'
+            if extraction_running:
+                total = job_progress['total']
+                col_progress, col_cancel = st.columns([4, 1])
+                with col_progress:
+                    st.progress(
+                        job_progress['done'] / total if total else 0.0,
+                        text=f"Processing PDF pages... {job_progress['done']} of {total} page quarters"
+                    )
+                with col_cancel:
+                    st.button("Cancel Extraction", key="cancel_extraction_btn", on_click=job.cancel)
+            elif job_progress['status'] == 'cancelled':
+                st.info("Extraction was cancelled; showing the tags found before it stopped.")
+            for level, message in job_progress['messages']:
+                if level == 'error':
+                    st.error(message)
+                else:
+                    st.warning(message)
+        tags = st.session_state.tags
         
         if tags:
-            st.success(f"Found {len(tags)} valid tags!")
-            st.session_state.tags = tags
-
-            # Callback functions for Select All / Deselect All
-            def select_all_tags_callback():
-                if 'tags' in st.session_state and st.session_state.tags:
-                    for i_cb in range(len(st.session_state.tags)):
-                        st.session_state.tags[i_cb]['selected_for_print'] = True
-                        checkbox_key = f"form_select_{i_cb}"
-                        if checkbox_key in st.session_state:
-                            st.session_state[checkbox_key] = True
-            
-            def deselect_all_tags_callback():
-                if 'tags' in st.session_state and st.session_state.tags:
-                    for i_cb in range(len(st.session_state.tags)):
-                        st.session_state.tags[i_cb]['selected_for_print'] = False
-                        checkbox_key = f"form_select_{i_cb}"
-                        if checkbox_key in st.session_state:
-                            st.session_state[checkbox_key] = False
-            
-            # Show tag preview with form-based editing
+            if extraction_running:
+                st.success(f"Found {len(tags)} valid tags so far, more are on the way...")
+            else:
+                st.success(f"Found {len(tags)} valid tags!")
+
+            # Show tag preview with grid-based editing
             st.subheader("Preview of Extracted Tags")
             
             # Add Select All / Deselect All buttons with callbacks
-            col1_buttons, col2_buttons, col3_info = st.columns([1, 1, 2])
-            with col1_buttons:
-                st.button("Select All Tags", key="select_all_callback_btn_v2", on_click=select_all_tags_callback)
-
-            with col2_buttons:
-                st.button("Deselect All", key="deselect_all_callback_btn_v2", on_click=deselect_all_tags_callback)
-
-            # Display tag count information
-            with col3_info:
-                selected_count = sum(1 for tag in st.session_state.tags if tag.get('selected_for_print', False))
-                st.write(f"Selected: {selected_count} of {len(st.session_state.tags)} tags")
-            st.write("") # Spacer
-
-            # Add a form for tag editing
-            with st.form("tag_edit_form"):
-                for idx, tag_data in enumerate(st.session_state.tags):
-                    with st.container():
-                        # Display warnings based on _missing_fields populated during the last save
-                        saved_missing_fields = tag_data.get('_missing_fields', [])
-                        if saved_missing_fields:
-                            # Customize warning if the tag is also selected for print
-                            if tag_data.get('selected_for_print', False):
-                                st.error(f"Tag {idx + 1} (Selected for PDF) - Product: '{tag_data.get('productName', 'N/A')}' has missing fields: {', '.join(saved_missing_fields)}. Please complete and save.")
-                            else:
-                                st.warning(f"Tag {idx + 1} - Product: '{tag_data.get('productName', 'N/A')}' has missing fields: {', '.join(saved_missing_fields)}. Please complete if you plan to select it.")
-                        
-                        cols_form = st.columns([3, 1])
-                        with cols_form[0]:
-                            st.text_input("Product Name", value=tag_data.get('productName', ''), key=f"form_pn_{idx}")
-                            st.text_input("SKU", value=tag_data.get('sku', ''), key=f"form_sku_{idx}")
-                            st.text_input("Price", value=tag_data.get('price', ''), key=f"form_price_{idx}")
-                        
-                        with cols_form[1]:
-                            st.checkbox("Select for PDF", value=tag_data.get('selected_for_print', False), key=f"form_select_{idx}")
-                        
-                        if idx < len(st.session_state.tags) - 1:
-                            st.markdown("---")
-                
-                # Submit button for the form
-                if st.form_submit_button("Save Changes and Validate Tags"):
-                    any_errors_in_selected_tags = False
-                    for i in range(len(st.session_state.tags)):
-                        tag = st.session_state.tags[i] # Work directly with the tag in session state
-
-                        tag['productName'] = st.session_state[f"form_pn_{i}"]
-                        tag['sku'] = st.session_state[f"form_sku_{i}"]
-                        tag['price'] = st.session_state[f"form_price_{i}"].replace('$', '').strip()
-                        tag['selected_for_print'] = st.session_state[f"form_select_{i}"]
-                        
-                        current_missing_fields = []
-                        if not tag.get('productName'):
-                            current_missing_fields.append('Product Name')
-                        if not tag.get('sku'):
-                            current_missing_fields.append('SKU')
-                        if not tag.get('price'):
-                            current_missing_fields.append('Price')
-                        
-                        # Auto-generate barcode if SKU is provided and barcode is empty or not yet generated
-                        if tag.get('sku') and not tag.get('barcode'):
-                            tag['barcode'] = ''.join(filter(str.isalnum, tag['sku']))
-                        
-                        # After potential auto-generation, check barcode again
-                        if not tag.get('barcode'):
-                             if tag.get('sku'): # Barcode should have been generated from SKU but might be empty if SKU was e.g. only symbols
-                                 if not tag.get('barcode'): # Check again if it's *still* empty
-                                     current_missing_fields.append('Barcode (could not auto-generate from SKU)')
-                             else: # No SKU, so no Barcode
-                                 if 'SKU' not in current_missing_fields: current_missing_fields.append('SKU (needed for Barcode)')
-                                 current_missing_fields.append('Barcode')
-                        
-                        tag['_missing_fields'] = list(set(current_missing_fields)) # Ensure unique fields & update tag
-
-                        if tag['_missing_fields'] and tag['selected_for_print']:
-                            any_errors_in_selected_tags = True
-                    
-                    if any_errors_in_selected_tags:
-                        st.error("Changes saved, but one or more SELECTED tags still have missing information. Please review the errors next to each tag.")
-                    else:
-                        st.success("Changes saved and all tags validated! Selected tags (if any) are ready for PDF generation.")
-                    # Streamlit implicitly reruns on form submission, updating the warnings in the form.
+            show_selection_controls()
+
+            show_tag_editor()
             
             # Show generate button
             st.markdown("---")
-            
-            # PDF Generation Section
-            st.markdown("---")
-            # Filter for tags marked 'selected_for_print' directly from session_state
-            selected_tags_for_pdf_generation = [tag for tag in st.session_state.tags if tag.get('selected_for_print', False)]
-
-            if not selected_tags_for_pdf_generation:
-                st.info("No tags are currently selected for printing. Please select tags in the form and click 'Save Changes and Validate Tags'.")
-                # Disable button if no tags are selected
-                st.button("Generate PDF", type="primary", disabled=True, key="generate_pdf_button_disabled_no_selection")
-            else:
-                # Check if any of the selected tags have missing fields (as determined by the last save)
-                tags_ready_for_pdf = []
-                problematic_selected_tags = []
-                for tag in selected_tags_for_pdf_generation:
-                    if tag.get('_missing_fields'): # Check the pre-populated list
-                        problematic_selected_tags.append(tag)
-                    else:
-                        tags_ready_for_pdf.append(tag)
-                
-                if problematic_selected_tags:
-                    st.error(f"Cannot generate PDF: {len(problematic_selected_tags)} selected tag(s) still have missing information (marked with errors above). Please correct them and click 'Save Changes and Validate Tags' again.")
-                    for prob_tag in problematic_selected_tags:
-                        st.warning(f"Tag '{prob_tag.get('productName', 'Unnamed')}' (SKU: {prob_tag.get('sku', 'N/A')}) is selected but has issues: {', '.join(prob_tag.get('_missing_fields', []))}")
-                    # Disable button if there are issues with selected tags
-                    st.button("Generate PDF for Selected Tags", type="primary", disabled=True, key="generate_pdf_button_disabled_issues")
-                elif not tags_ready_for_pdf: # Should only happen if selected_tags_for_pdf_generation was non-empty but all had issues
-                    st.info("No selected tags are ready for PDF generation. Please ensure selected tags are complete and saved.")
-                    st.button("Generate PDF", type="primary", disabled=True, key="generate_pdf_button_disabled_none_ready")
-                else:
-                    # All selected tags are valid, enable the button
-                    if st.button("Generate PDF for Selected Tags", type="primary", key="generate_pdf_button_final"):
-                        with st.spinner("Generating PDF..."):
-                            pdf_data = generate_pdf(tags_ready_for_pdf) # Use the filtered list
-                            if pdf_data:
-                                st.success(f"PDF generated successfully with {len(tags_ready_for_pdf)} tags!")
-                                st.download_button(
-                                    label="Download PDF of Selected Tags",
-                                    data=pdf_data,
-                                    file_name="price_tags_final.pdf",
-                                    mime="application/pdf",
-                                    key="download_pdf_button_final_dl"
-                                )
-                            else:
-                                st.error("PDF generation failed or resulted in an empty document.")
+            show_pdf_generation(tag_settings)
             
             # Show debug log at the bottom
             show_debug_log()
                 
+        elif extraction_running:
+            st.info("Waiting for the first tags...")
+            show_debug_log()
         else:
             st.error("No valid tags found. Please check if the PDF format is correct.")
-            st.session_state.tags = []
+            st.session_state.tags = TagStore()
+            st.session_state.tag_validator.reset(st.session_state.tags)
             show_debug_log()  # Show debug log even if no tags found
     except Exception as e:
         st.error(f"Error processing PDF: {str(e)}")
-        st.session_state.tags = []
+        st.session_state.tags = TagStore()
+        st.session_state.tag_validator.reset(st.session_state.tags)
+        st.session_state.source_pdf_key = None
         show_debug_log()  # Show debug log even if no tags found
-    finally:
-        # Cleanup
-        try:
-            os.unlink(tmp_file_path)
-        except:
-            pass
-
-# Sidebar for settings
-with st.sidebar:
-    st.header("Tag Settings")
-    tag_size = st.selectbox("Tag Size", ["4x1.5"], help="Size in inches (width x height)")
-    
-    st.subheader("Font Settings")
-    font_name = st.selectbox("Font", ["Helvetica"], help="Select font family")
-    font_size = st.number_input("Base Font Size", min_value=8, max_value=24, value=12)
-    price_size = st.number_input("Price Font Size", min_value=8, max_value=36, value=14)
-    margin = st.number_input("Margin (inches)", min_value=0.1, max_value=0.5, value=0.25, step=0.05)
 
 # Main content
 st.header("Product Information")
 
+# Structured tag files skip OCR entirely
+st.subheader("Import Tags")
+st.file_uploader(
+    "Tags.json, JSONL or CSV file",
+    type=[extension.lstrip('.') for extension in IMPORT_FORMATS],
+    help="CSV columns and JSON keys: productName, sku, price, barcode (derived from the SKU when empty), description",
+    key="import_file"
+)
+st.button("Import Tags", key="import_tags_btn", on_click=import_tag_file)
+for level, message in st.session_state.import_notices:
+    getattr(st, level)(message)
+st.session_state.import_notices = []
+
+# Weekly price updates reprint only the tags whose price changed
+st.subheader("Update Prices")
+st.file_uploader(
+    "Price feed (CSV, JSONL or Tags.json)",
+    type=[extension.lstrip('.') for extension in IMPORT_FORMATS],
+    help="Rows are matched to the current tags by SKU, then by barcode. Changed tags are repriced and become the only ones selected for the PDF.",
+    key="price_feed_file"
+)
+st.button("Apply Price Feed", key="apply_price_feed_btn", on_click=apply_price_feed)
+show_price_report()
+
 # Form for adding new tags
 with st.form("new_tag"):
     st.subheader("Add New Tag")
@@ -657,129 +899,20 @@ with st.form("new_tag"):
         new_tag['_missing_fields'] = manual_missing
 
         st.session_state.tags.append(new_tag)
+        st.session_state.tag_validator.tags_appended(st.session_state.tags, 1)
+        st.session_state.tag_validator.validate(st.session_state.tags)
         st.success("Tag added successfully!")
         if manual_missing:
-            st.warning(f"The manually added tag is missing: {', '.join(manual_missing)}. Please complete it in the 'Current Tags' section.")
+            st.warning(f"The manually added tag is missing: {', '.join(manual_missing)}. Please complete it in the tag editor.")
 
-# Display and manage existing tags
-if st.session_state.tags:
+# Display and manage existing tags (with an upload they are edited in the preview above)
+if st.session_state.tags and not uploaded_file:
     st.subheader("Current Tags")
-    for idx, tag in enumerate(st.session_state.tags):
-        # Clean up product name in expander title
-        product_name = tag.get('productName', 'Unnamed Tag').split('Regular Price:')[0].strip()
-        missing_fields = tag.get('_missing_fields', [])
-        expander_title = product_name if product_name else "Tag (Missing Name)"
-        if not product_name and not tag.get('sku') and not tag.get('price'): # Likely an empty/failed OCR tag
-            expander_title = f"Tag {idx + 1} (Empty - Needs Review)"
-        elif missing_fields:
-            expander_title += " ⚠️ (NEEDS ATTENTION)"
-
-        with st.expander(expander_title):
-            if missing_fields:
-                st.warning("This tag has missing required information. Please fill in all (REQUIRED) fields below.")
-
-            cols = st.columns([2, 1])
-            
-            with cols[0]:
-                # Editable fields for Product Name, SKU, and Price
-                # Editable Product Name
-                label_pn = "Product Name"
-                if 'productName' in missing_fields:
-                    label_pn += " (REQUIRED)"
-                new_product_name = st.text_input(
-                    label_pn,
-                    value=tag.get('productName', ''),
-                    key=f"product_name_edit_{idx}"
-                )
-
-                # Editable SKU
-                label_sku = "SKU"
-                if 'sku' in missing_fields:
-                    label_sku += " (REQUIRED)"
-                new_sku = st.text_input(
-                    label_sku,
-                    value=tag.get('sku', ''),
-                    key=f"sku_edit_{idx}"
-                )
-                st.write(f"Barcode: {tag['barcode']}")
-                if tag.get('description'):
-                    st.write(f"Description: {tag['description']}")
-
-            
-            with cols[1]:
-                # Price editing
-                # Editable Price
-                label_price = "Price"
-                if 'price' in missing_fields:
-                    label_price += " (REQUIRED)"
-                new_price = st.text_input(
-                    label_price,
-                    value=tag.get('price', ''),
-                    key=f"price_edit_{idx}",
-                    help="Enter new price without $ symbol"
-                )
-                
-                # Update and Remove buttons side by side
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Update", key=f"update_{idx}"):
-                        try:
-                            # Validate price format
-                            new_price = new_price.strip()
-                            # Remove any existing $ symbol
-                            new_price = new_price.replace('$', '')
-                            # Ensure it's a valid number
-                            float(new_price)  # This will raise ValueError if not a valid number
-                            # Process and validate price
-                            processed_price = new_price.replace('$', '').strip()
-                            float(processed_price) # Validate if it's a number, will raise ValueError if not
-
-                            # Update fields in session state
-                            st.session_state.tags[idx]['productName'] = new_product_name
-                            st.session_state.tags[idx]['sku'] = new_sku
-                            st.session_state.tags[idx]['price'] = processed_price
-
-                            # Update missing fields list
-                            current_missing = list(st.session_state.tags[idx].get('_missing_fields', []))
-                            
-                            # Product Name
-                            if new_product_name and 'productName' in current_missing:
-                                current_missing.remove('productName')
-                            elif not new_product_name and 'productName' not in current_missing:
-                                current_missing.append('productName')
-                            
-                            # SKU & Barcode
-                            if new_sku and 'sku' in current_missing:
-                                current_missing.remove('sku')
-                            elif not new_sku and 'sku' not in current_missing:
-                                current_missing.append('sku')
-                            
-                            # Barcode depends on SKU
-                            if new_sku:
-                                new_barcode_val = ''.join(filter(str.isalnum, new_sku))
-                                st.session_state.tags[idx]['barcode'] = new_barcode_val
-                                if new_barcode_val and 'barcode' in current_missing:
-                                    current_missing.remove('barcode')
-                                elif not new_barcode_val and 'barcode' not in current_missing:
-                                    current_missing.append('barcode') # Should not happen if SKU is present
-                            else: # SKU is empty
-                                st.session_state.tags[idx]['barcode'] = ""
-                                if 'barcode' not in current_missing:
-                                    current_missing.append('barcode')
-
-                            # Price
-                            if processed_price and 'price' in current_missing:
-                                current_missing.remove('price')
-                            elif not processed_price and 'price' not in current_missing:
-                                current_missing.append('price')
-
-                            st.session_state.tags[idx]['_missing_fields'] = current_missing
-                            
-                            st.success(f"Tag updated!")
-                            st.rerun()
-                        except ValueError:
-                            st.error("Please enter a valid price (numbers only)")
-                with col2:
-                    if st.button("Remove", key=f"remove_{idx}"):
-                        st.session_state.tags.pop(idx)
-                        st.rerun()
+    show_selection_controls()
+    show_tag_editor()
+    show_pdf_generation(tag_settings)
+
+# Keep rerunning while the background extraction publishes more tags
+if extraction_running:
+    time.sleep(EXTRACTION_POLL_SECONDS)
+    st.rerun()